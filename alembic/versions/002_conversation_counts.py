@@ -0,0 +1,98 @@
+"""Denormalize conversation message/token counts
+
+Revision ID: 002_conversation_counts
+Revises: 001_initial_migration
+Create Date: 2026-10-15 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '002_conversation_counts'
+down_revision = '001_initial_migration'
+branch_labels = None
+depends_on = None
+
+POSTGRES_TRIGGER = """
+CREATE OR REPLACE FUNCTION bump_conv_counts() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        UPDATE conversations
+        SET message_count = message_count + 1,
+            token_count = token_count + COALESCE(NEW.tokens, 0)
+        WHERE id = NEW.conversation_id;
+        RETURN NEW;
+    ELSE
+        UPDATE conversations
+        SET message_count = message_count - 1,
+            token_count = token_count - COALESCE(OLD.tokens, 0)
+        WHERE id = OLD.conversation_id;
+        RETURN OLD;
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_msg_counts
+AFTER INSERT OR DELETE ON messages
+FOR EACH ROW EXECUTE FUNCTION bump_conv_counts();
+"""
+
+SQLITE_TRIGGERS = [
+    """
+    CREATE TRIGGER trg_msg_counts_insert AFTER INSERT ON messages
+    BEGIN
+        UPDATE conversations
+        SET message_count = message_count + 1,
+            token_count = token_count + COALESCE(NEW.tokens, 0)
+        WHERE id = NEW.conversation_id;
+    END
+    """,
+    """
+    CREATE TRIGGER trg_msg_counts_delete AFTER DELETE ON messages
+    BEGIN
+        UPDATE conversations
+        SET message_count = message_count - 1,
+            token_count = token_count - COALESCE(OLD.tokens, 0)
+        WHERE id = OLD.conversation_id;
+    END
+    """,
+]
+
+BACKFILL = """
+UPDATE conversations SET
+    message_count = (
+        SELECT COUNT(*) FROM messages WHERE messages.conversation_id = conversations.id
+    ),
+    token_count = (
+        SELECT COALESCE(SUM(tokens), 0) FROM messages WHERE messages.conversation_id = conversations.id
+    )
+"""
+
+def upgrade() -> None:
+    op.add_column('conversations',
+        sa.Column('message_count', sa.Integer(), server_default='0', nullable=False)
+    )
+    op.add_column('conversations',
+        sa.Column('token_count', sa.BigInteger(), server_default='0', nullable=False)
+    )
+    op.execute(BACKFILL)
+
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.execute(POSTGRES_TRIGGER)
+    elif dialect == 'sqlite':
+        for trigger in SQLITE_TRIGGERS:
+            op.execute(trigger)
+
+def downgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.execute("DROP TRIGGER IF EXISTS trg_msg_counts ON messages")
+        op.execute("DROP FUNCTION IF EXISTS bump_conv_counts()")
+    elif dialect == 'sqlite':
+        op.execute("DROP TRIGGER IF EXISTS trg_msg_counts_insert")
+        op.execute("DROP TRIGGER IF EXISTS trg_msg_counts_delete")
+
+    with op.batch_alter_table('conversations') as batch_op:
+        batch_op.drop_column('token_count')
+        batch_op.drop_column('message_count')
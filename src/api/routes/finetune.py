@@ -1,3 +1,4 @@
+import asyncio
 from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
 from fastapi.responses import StreamingResponse
@@ -89,6 +90,12 @@ async def create_finetune_job(
         
         return finetune_job
         
+    except asyncio.QueueFull:
+        raise HTTPException(
+            status_code=503,
+            detail="Fine-tuning queue is full, try again later",
+            headers={"Retry-After": "60"},
+        )
     except FileNotFoundError as e:
         raise HTTPException(status_code=404, detail="Dataset not found")
     except ValueError as e:
@@ -17,6 +17,8 @@ class Settings:
     PORT: int = 8000
     WORKERS: int = 1
     LOG_LEVEL: str = "info"
+    LIMIT_CONCURRENCY: int = 1000
+    KEEP_ALIVE_TIMEOUT: int = 30
     
     # Database
     DATABASE_URL: str = "sqlite:///./llm_platform.db"
@@ -27,6 +29,8 @@ class Settings:
     REDIS_URL: str = "redis://localhost:6379/0"
     REDIS_POOL_SIZE: int = 5
     CACHE_TTL: int = 3600
+    CACHE_NORMALIZE_PROMPTS: bool = True  # ignore leading/trailing whitespace in cache keys
+    CACHE_MAX_ENTRIES: int = 100000  # 0 disables score-based eviction
     
     # Ollama
     OLLAMA_BASE_URL: str = "http://localhost:11434"
@@ -35,6 +39,14 @@ class Settings:
     MAX_TOKENS: int = 4096
     TEMPERATURE: float = 0.7
     
+    # HTTP client (Ollama)
+    HTTP_TIMEOUT: float = 30.0
+    HTTP_CONNECT_TIMEOUT: float = 5.0
+    HTTP_MAX_CONNECTIONS: int = 1000
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 100
+    HTTP_KEEPALIVE_EXPIRY: float = 30.0
+    HTTP2_ENABLED: bool = True
+    
     # Load Balancing
     LOAD_BALANCER_STRATEGY: str = "round_robin"
     
@@ -76,18 +88,22 @@ class Settings:
                 env_value = os.getenv(key)
                 if env_value is not None:
                     # Handle special cases
-                    if key in ['DEBUG', 'METRICS_ENABLED']:
+                    if key in ['DEBUG', 'METRICS_ENABLED', 'HTTP2_ENABLED',
+                               'CACHE_NORMALIZE_PROMPTS']:
                         setattr(self, key, env_value.lower() in ['true', '1', 'yes'])
                     elif key in ['PORT', 'MAX_TOKENS', 'RATE_LIMIT_PER_MINUTE', 
                                 'RATE_LIMIT_PER_HOUR', 'DATABASE_POOL_SIZE', 
                                 'DATABASE_MAX_OVERFLOW', 'REDIS_POOL_SIZE',
-                                'CACHE_TTL', 'FINETUNE_MAX_EPOCHS', 'FINETUNE_BATCH_SIZE',
-                                'WORKERS', 'JWT_EXPIRE_MINUTES', 'BCRYPT_ROUNDS']:
+                                'CACHE_TTL', 'CACHE_MAX_ENTRIES', 'FINETUNE_MAX_EPOCHS', 'FINETUNE_BATCH_SIZE',
+                                'WORKERS', 'JWT_EXPIRE_MINUTES', 'BCRYPT_ROUNDS',
+                                'LIMIT_CONCURRENCY', 'KEEP_ALIVE_TIMEOUT',
+                                'HTTP_MAX_CONNECTIONS', 'HTTP_MAX_KEEPALIVE_CONNECTIONS']:
                         try:
                             setattr(self, key, int(env_value))
                         except:
                             pass
-                    elif key in ['TEMPERATURE', 'FINETUNE_LEARNING_RATE']:
+                    elif key in ['TEMPERATURE', 'FINETUNE_LEARNING_RATE', 'HTTP_TIMEOUT',
+                                'HTTP_CONNECT_TIMEOUT', 'HTTP_KEEPALIVE_EXPIRY']:
                         try:
                             setattr(self, key, float(env_value))
                         except:
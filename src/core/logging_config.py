@@ -0,0 +1,83 @@
+import logging
+import queue
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+import orjson
+
+
+class JSONFormatter(logging.Formatter):
+    """Render log records as single-line JSON"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "timestamp": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            payload["exception"] = self.formatException(record.exc_info)
+        return orjson.dumps(payload, default=str).decode()
+
+
+class RawQueueHandler(QueueHandler):
+    """Enqueue records untouched so formatting happens on the listener thread"""
+
+    def __init__(self, log_queue, fallback: logging.Handler):
+        super().__init__(log_queue)
+        self.fallback = fallback
+
+    def emit(self, record: logging.LogRecord) -> None:
+        # Without a running listener (no lifespan, or after shutdown) nothing
+        # drains the queue, so write synchronously instead
+        if _started:
+            super().emit(record)
+        else:
+            self.fallback.handle(record)
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The stock prepare() formats the record here and drops exc_info
+        return record
+
+
+_listener: Optional[QueueListener] = None
+_started = False
+
+
+def setup_logging(level: str = "info") -> None:
+    """Route root logging through a queue so request threads only enqueue records"""
+    global _listener
+    if _listener is not None:
+        return
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+
+    stream_handler = logging.StreamHandler(sys.stderr)
+    stream_handler.setFormatter(JSONFormatter())
+
+    root = logging.getLogger()
+    root.handlers.clear()
+    root.addHandler(RawQueueHandler(log_queue, stream_handler))
+    root.setLevel(getattr(logging, level.upper(), logging.INFO))
+
+    _listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+
+
+def start_logging() -> None:
+    """Start the background log writer thread"""
+    global _started
+    if _listener is not None and not _started:
+        _listener.start()
+        _started = True
+
+
+def stop_logging() -> None:
+    """Flush queued records and stop the background log writer thread"""
+    global _started
+    if _listener is not None and _started:
+        # Flip first so new records go to the fallback while stop() drains
+        _started = False
+        _listener.stop()
@@ -1,6 +1,7 @@
 from typing import List, Optional, Dict, Any
 from sqlalchemy.orm import Session
-from sqlalchemy import desc, and_, or_
+from sqlalchemy.orm.attributes import NO_VALUE, set_committed_value
+from sqlalchemy import desc, and_, or_, inspect
 from datetime import datetime, timedelta
 
 from .models import (
@@ -9,6 +10,27 @@ from .models import (
 )
 
 
+def _insert_returning(db: Session, model, values: dict):
+    """Insert a row and keep the instance loaded across commit, skipping a refresh SELECT"""
+    obj = model(**values)
+    db.add(obj)
+    # On RETURNING backends the flush's INSERT also returns the PK and SQL
+    # defaults (eager_defaults="auto"), so every column is loaded here
+    db.flush()
+    state = inspect(obj)
+    loaded = {}
+    for key in state.mapper.column_attrs.keys():
+        value = state.attrs[key].loaded_value
+        # Columns left out of the INSERT without a default are NULL
+        loaded[key] = None if value is NO_VALUE else value
+    db.commit()
+    # Commit expires the instance; restore the values just written so it
+    # stays session-bound and readable after the session closes
+    for key, value in loaded.items():
+        set_committed_value(obj, key, value)
+    return obj
+
+
 # User CRUD
 def get_user_by_id(db: Session, user_id: int) -> Optional[User]:
     return db.query(User).filter(User.id == user_id).first()
@@ -91,11 +113,7 @@ def delete_conversation(db: Session, conversation_id: int, user_id: Optional[int
 
 # Message CRUD
 def add_message(db: Session, **kwargs) -> Message:
-    message = Message(**kwargs)
-    db.add(message)
-    db.commit()
-    db.refresh(message)
-    return message
+    return _insert_returning(db, Message, kwargs)
 
 def get_conversation_messages(db: Session, conversation_id: int, skip: int = 0, limit: int = 100) -> List[Message]:
     return (
@@ -110,11 +128,7 @@ def get_conversation_messages(db: Session, conversation_id: int, skip: int = 0,
 
 # Finetune Job CRUD
 def create_finetune_job(db: Session, job_data: dict) -> FinetuneJob:
-    job = FinetuneJob(**job_data)
-    db.add(job)
-    db.commit()
-    db.refresh(job)
-    return job
+    return _insert_returning(db, FinetuneJob, job_data)
 
 def get_finetune_job(db: Session, job_id: int) -> Optional[FinetuneJob]:
     return db.query(FinetuneJob).filter(FinetuneJob.id == job_id).first()
@@ -137,11 +151,7 @@ def update_finetune_job(db: Session, job_id: int, update_data: dict) -> Optional
 
 # Code Block CRUD
 def save_code_block(db: Session, code_data: dict) -> CodeBlock:
-    code_block = CodeBlock(**code_data)
-    db.add(code_block)
-    db.commit()
-    db.refresh(code_block)
-    return code_block
+    return _insert_returning(db, CodeBlock, code_data)
 
 def get_code_blocks_by_message(db: Session, message_id: int) -> List[CodeBlock]:
     return db.query(CodeBlock).filter(CodeBlock.message_id == message_id).all()
@@ -149,11 +159,7 @@ def get_code_blocks_by_message(db: Session, message_id: int) -> List[CodeBlock]:
 
 # System Log CRUD
 def create_system_log(db: Session, log_data: dict) -> SystemLog:
-    log = SystemLog(**log_data)
-    db.add(log)
-    db.commit()
-    db.refresh(log)
-    return log
+    return _insert_returning(db, SystemLog, log_data)
 
 def get_system_logs(db: Session, level: Optional[str] = None, limit: int = 100) -> List[SystemLog]:
     query = db.query(SystemLog)
@@ -33,22 +33,16 @@ class Conversation(Base):
     user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
     title = Column(String(255), nullable=False)
     model_name = Column(String(100), nullable=False)
-    metadata = Column(JSON, nullable=True)
+    metadata_ = Column("metadata", JSON, nullable=True)  # "metadata" is reserved by declarative
+    # Maintained by database triggers on messages (see migration 002)
+    message_count = Column(Integer, nullable=False, default=0, server_default="0")
+    token_count = Column(BigInteger, nullable=False, default=0, server_default="0")
     created_at = Column(DateTime, default=func.now())
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
     
     # Relationships
     user = relationship("User", back_populates="conversations")
     messages = relationship("Message", back_populates="conversation", cascade="all, delete-orphan")
-    
-    # Computed columns (not stored, for convenience)
-    @property
-    def message_count(self):
-        return len(self.messages)
-    
-    @property
-    def token_count(self):
-        return sum(m.tokens or 0 for m in self.messages)
 
 
 class Message(Base):
@@ -59,7 +53,7 @@ class Message(Base):
     role = Column(String(20), nullable=False)  # user, assistant, system
     content = Column(Text, nullable=False)
     tokens = Column(Integer, nullable=True)
-    metadata = Column(JSON, nullable=True)
+    metadata_ = Column("metadata", JSON, nullable=True)  # "metadata" is reserved by declarative
     created_at = Column(DateTime, default=func.now())
     
     # Relationships
@@ -102,7 +96,7 @@ class FinetuneDataset(Base):
     format = Column(String(20), nullable=False)  # jsonl, csv, parquet
     file_path = Column(String(500), nullable=False)
     size = Column(BigInteger, default=0)  # File size in bytes
-    metadata = Column(JSON, nullable=True)
+    metadata_ = Column("metadata", JSON, nullable=True)  # "metadata" is reserved by declarative
     created_at = Column(DateTime, default=func.now())
     
     # Relationships
@@ -118,7 +112,7 @@ class CodeBlock(Base):
     code = Column(Text, nullable=False)
     start_line = Column(Integer, nullable=False)
     end_line = Column(Integer, nullable=False)
-    metadata = Column(JSON, nullable=True)
+    metadata_ = Column("metadata", JSON, nullable=True)  # "metadata" is reserved by declarative
     created_at = Column(DateTime, default=func.now())
     
     # Relationships
@@ -132,7 +126,7 @@ class SystemLog(Base):
     level = Column(String(20), nullable=False)  # INFO, WARNING, ERROR, DEBUG
     module = Column(String(100), nullable=True)
     message = Column(Text, nullable=False)
-    metadata = Column(JSON, nullable=True)
+    metadata_ = Column("metadata", JSON, nullable=True)  # "metadata" is reserved by declarative
     created_at = Column(DateTime, default=func.now(), index=True)
 
 
@@ -5,21 +5,23 @@ from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from contextlib import asynccontextmanager
 import uvicorn
 import logging
+import sys
 from datetime import datetime
 
 # Import our simple settings
 from src.config.settings import settings
+from src.core.logging_config import setup_logging, start_logging, stop_logging
+from src.utils.code_extractor import CodeExtractor
 
 # Setup logging
-logging.basicConfig(
-    level=getattr(logging, settings.LOG_LEVEL.upper()),
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+setup_logging(settings.LOG_LEVEL)
 logger = logging.getLogger(__name__)
 
 # Security
 security = HTTPBearer()
 
+code_extractor = CodeExtractor()
+
 async def verify_auth(credentials: HTTPAuthorizationCredentials = Depends(security)):
     """Verify API key"""
     if credentials.credentials != settings.API_KEY:
@@ -30,13 +32,11 @@ async def verify_auth(credentials: HTTPAuthorizationCredentials = Depends(securi
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
-    logger.info("=" * 60)
+    start_logging()
     logger.info(f"🚀 Starting {settings.APP_NAME}")
-    logger.info(f"📅 {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    logger.info(f"🌐 Host: {settings.HOST}:{settings.PORT}")
-    logger.info(f"🔧 Debug: {settings.DEBUG}")
-    logger.info(f"🗄️  Database: {settings.DATABASE_URL}")
-    logger.info("=" * 60)
+    logger.debug(f"🌐 Host: {settings.HOST}:{settings.PORT}")
+    logger.debug(f"🔧 Debug: {settings.DEBUG}")
+    logger.debug(f"🗄️  Database: {settings.DATABASE_URL}")
     
     # Startup complete
     logger.info("✅ Application startup complete")
@@ -45,6 +45,7 @@ async def lifespan(app: FastAPI):
     
     # Shutdown
     logger.info("🛑 Application shutdown")
+    stop_logging()
 
 # Create FastAPI app
 app = FastAPI(
@@ -56,10 +57,30 @@ app = FastAPI(
     lifespan=lifespan,
 )
 
+# Paths scraped by probes and Prometheus; never called cross-origin
+CORS_EXEMPT_PATHS = frozenset({"/health", "/metrics"})
+CORS_ORIGINS = tuple(settings.get_cors_origins())
+
+
+class GatedCORSMiddleware:
+    """CORS middleware that skips probe and metrics endpoints"""
+    
+    def __init__(self, app, exempt_paths=CORS_EXEMPT_PATHS, **cors_options):
+        self.app = app
+        self.cors = CORSMiddleware(app, **cors_options)
+        self.exempt_paths = exempt_paths
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"] in self.exempt_paths:
+            await self.app(scope, receive, send)
+        else:
+            await self.cors(scope, receive, send)
+
+
 # Add CORS middleware
 app.add_middleware(
-    CORSMiddleware,
-    allow_origins=settings.get_cors_origins(),
+    GatedCORSMiddleware,
+    allow_origins=CORS_ORIGINS,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
@@ -188,30 +209,10 @@ async def chat(request: Request, current_user: dict = Depends(verify_auth)):
                     full_response = result.get("response", "")
                     
                     # Extract code blocks
-                    code_blocks = []
-                    lines = full_response.split('\n')
-                    in_code_block = False
-                    current_code = []
-                    current_language = ""
-                    
-                    for line in lines:
-                        if line.strip().startswith('```'):
-                            if in_code_block:
-                                # End of code block
-                                in_code_block = False
-                                if current_code:
-                                    code_blocks.append({
-                                        "language": current_language,
-                                        "code": '\n'.join(current_code)
-                                    })
-                                current_code = []
-                                current_language = ""
-                            else:
-                                # Start of code block
-                                in_code_block = True
-                                current_language = line.strip().replace('```', '').strip()
-                        elif in_code_block:
-                            current_code.append(line)
+                    code_blocks = [
+                        {"language": block.language, "code": block.code}
+                        for block in code_extractor.extract_blocks(full_response)
+                    ]
                     
                     return {
                         "message": full_response,
@@ -243,6 +244,11 @@ async def chat(request: Request, current_user: dict = Depends(verify_auth)):
 
 # Run server
 if __name__ == "__main__":
+    # uvloop and httptools are not available on Windows
+    server_options = {}
+    if sys.platform != "win32":
+        server_options = {"loop": "uvloop", "http": "httptools"}
+    
     uvicorn.run(
         "src.main:app",
         host=settings.HOST,
@@ -250,4 +256,8 @@ if __name__ == "__main__":
         reload=settings.DEBUG,
         workers=settings.WORKERS,
         log_level=settings.LOG_LEVEL,
+        lifespan="on",
+        limit_concurrency=settings.LIMIT_CONCURRENCY,
+        timeout_keep_alive=settings.KEEP_ALIVE_TIMEOUT,
+        **server_options,
     )
\ No newline at end of file
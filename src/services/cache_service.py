@@ -1,35 +1,124 @@
 import asyncio
 import json
-from typing import Optional, Any, Dict
+import socket
+import time
+from collections import OrderedDict
+from typing import Optional, Any, Dict, List, Set, Tuple
 from datetime import datetime, timedelta
-import aioredis
+from redis import asyncio as aioredis
+import msgspec
+import zstandard as zstd
 from loguru import logger
 
 from src.config.settings import settings
 
 
+_encoder = msgspec.msgpack.Encoder()
+_decoder = msgspec.msgpack.Decoder()
+_compressor = zstd.ZstdCompressor(level=3)
+_decompressor = zstd.ZstdDecompressor()
+
+# Payloads larger than this are zstd-compressed
+COMPRESS_THRESHOLD = 1024
+
+# One-byte header in front of every msgpack payload
+_RAW_TAG = 0x00
+_ZSTD_TAG = 0x01
+
+# Entries written before the msgpack switch hold JSON text. A msgpack payload
+# longer than one byte never starts with these or with the tags above (they
+# are all positive fixints), so untagged legacy entries stay readable.
+_LEGACY_JSON_PREFIX = b'{["'
+
+
+def _encode(value: Any) -> bytes:
+    """Encode a value for caching, compressing large payloads"""
+    payload = _encoder.encode(value)
+    if len(payload) > COMPRESS_THRESHOLD:
+        return bytes((_ZSTD_TAG,)) + _compressor.compress(payload)
+    return bytes((_RAW_TAG,)) + payload
+
+
+def _decode(value: bytes) -> Any:
+    """Decode a cached payload"""
+    if len(value) > 1:
+        tag = value[0]
+        if tag == _RAW_TAG:
+            return _decoder.decode(memoryview(value)[1:])
+        if tag == _ZSTD_TAG:
+            return _decoder.decode(_decompressor.decompress(value[1:]))
+        if tag in _LEGACY_JSON_PREFIX:
+            return json.loads(value)
+    return _decoder.decode(value)
+
+
 class CacheService:
     """Redis-based caching service"""
     
-    def __init__(self):
+    def __init__(self, coalesce_gets: bool = False):
         self.redis: Optional[aioredis.Redis] = None
         self.prefix = "llm:cache:"
+        # Internal keys live outside prefix so clear_prefix never removes them
+        self.meta_prefix = "llm:cache-meta:"
+        self.delete_batch_size = 500
         
-        # Statistics
-        self.hits = 0
-        self.misses = 0
-        self.errors = 0
+        # Gets issued in the same loop tick are merged into one MGET
+        self.coalesce_gets = coalesce_gets
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._flush_tasks: Set[asyncio.Task] = set()
+        
+        # Statistics live in a Redis hash shared by all workers. Local deltas
+        # are flushed with HINCRBY in the pipeline of the next read.
+        self.stats_key = f"{self.meta_prefix}stats"
+        self._stat_deltas: Dict[str, int] = {}
+        
+        # INFO/ZCARD snapshot shared by stats requests within stats_ttl seconds
+        self.stats_ttl = 2.0
+        self._server_stats: Optional[Tuple[float, Dict[str, Any]]] = None
+        
+        # In-process L1 for hot keys. The short TTL bounds staleness across
+        # workers, since other processes' writes are not seen here. Entries
+        # never outlive their Redis TTL, and hold the encoded payload so every
+        # hit decodes a private copy that callers may mutate.
+        self.l1_max_size = 10_000
+        self.l1_ttl = 5.0
+        self._l1: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+        
+        # Value-aware eviction, only when an entry budget is set: a sorted
+        # set scores every entry by its hit count (+1 on insert, plus a
+        # fraction that grows with insert time so ties go to the oldest), so
+        # ZPOPMIN evicts the entries least likely to be reused once the
+        # budget is exceeded. A second sorted set scores entries by expiry
+        # time, so members of TTL-expired entries are pruned by score range.
+        # Hits are batched like the statistics deltas.
+        self.eviction_key = f"{self.meta_prefix}eviction"
+        self.expiry_key = f"{self.meta_prefix}expiry"
+        self.max_entries = settings.CACHE_MAX_ENTRIES
+        self._hit_deltas: Dict[str, int] = {}
     
     async def initialize(self):
         """Initialize Redis connection"""
         try:
-            self.redis = await aioredis.from_url(
+            # redis-py picks the hiredis C parser automatically when installed
+            # and already sets TCP_NODELAY on its sockets
+            keepalive_options = {}
+            if hasattr(socket, "TCP_KEEPIDLE"):
+                keepalive_options[socket.TCP_KEEPIDLE] = 60
+            
+            self.redis = aioredis.from_url(
                 settings.REDIS_URL,
-                encoding="utf-8",
-                decode_responses=True,
                 max_connections=settings.REDIS_POOL_SIZE,
+                socket_keepalive=True,
+                socket_keepalive_options=keepalive_options,
+                socket_connect_timeout=2,
+                health_check_interval=30,
             )
             await self.redis.ping()
+            
+            # Open the rest of the pool up front so first requests skip connect
+            await asyncio.gather(
+                *[self.redis.ping() for _ in range(settings.REDIS_POOL_SIZE)]
+            )
             logger.info("Cache service initialized successfully")
         except Exception as e:
             logger.error(f"Failed to initialize cache service: {e}")
@@ -40,22 +129,166 @@ class CacheService:
         if not self.redis:
             return None
         
+        cached = self._l1_get(key)
+        if cached is not None:
+            self._count("hits")
+            self._count_hit(key)
+            return _decode(cached)
+        
+        if self.coalesce_gets:
+            return await self._coalesced_get(key)
+        
         try:
             full_key = f"{self.prefix}{key}"
-            value = await self.redis.get(full_key)
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.get(full_key)
+                pipe.pttl(full_key)
+                self._queue_stat_deltas(pipe)
+                value, pttl = (await pipe.execute())[:2]
             
-            if value:
-                self.hits += 1
-                return json.loads(value)
+            if value is not None:
+                self._count("hits")
+                self._count_hit(key)
+                decoded = _decode(value)
+                self._l1_put(key, value, pttl)
+                return decoded
             else:
-                self.misses += 1
+                self._count("misses")
                 return None
                 
+        except (msgspec.DecodeError, zstd.ZstdError, ValueError) as e:
+            self._count("errors")
+            logger.warning(f"Cache decode error for {key}: {e}")
+            return None
         except Exception as e:
-            self.errors += 1
+            self._count("errors")
             logger.warning(f"Cache get error: {e}")
             return None
     
+    async def get_many(self, keys: List[str]) -> List[Optional[Any]]:
+        """Get several values from cache in one MGET round-trip"""
+        results = [None] * len(keys)
+        if not self.redis or not keys:
+            return results
+        
+        # Serve what we can from L1, fetch the rest from Redis
+        missing = []
+        for index, key in enumerate(keys):
+            cached = self._l1_get(key)
+            if cached is None:
+                missing.append(index)
+            else:
+                results[index] = _decode(cached)
+                self._count_hit(key)
+        self._count("hits", len(keys) - len(missing))
+        if not missing:
+            return results
+        
+        try:
+            full_keys = [f"{self.prefix}{keys[index]}" for index in missing]
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.mget(full_keys)
+                for full_key in full_keys:
+                    pipe.pttl(full_key)
+                self._queue_stat_deltas(pipe)
+                replies = await pipe.execute()
+            values, pttls = replies[0], replies[1:len(full_keys) + 1]
+        except Exception as e:
+            self._count("errors")
+            logger.warning(f"Cache mget error: {e}")
+            return results
+        
+        misses = 0
+        for index, value, pttl in zip(missing, values, pttls):
+            if value is None:
+                misses += 1
+                continue
+            self._count_hit(keys[index])
+            try:
+                results[index] = _decode(value)
+                self._l1_put(keys[index], value, pttl)
+            except (msgspec.DecodeError, zstd.ZstdError, ValueError) as e:
+                self._count("errors")
+                logger.warning(f"Cache decode error for {keys[index]}: {e}")
+        
+        self._count("misses", misses)
+        self._count("hits", len(missing) - misses)
+        return results
+    
+    def _l1_get(self, key: str) -> Optional[bytes]:
+        """Get a live encoded payload from the in-process cache"""
+        entry = self._l1.get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            del self._l1[key]
+            return None
+        self._l1.move_to_end(key)
+        return entry[1]
+    
+    def _l1_put(self, key: str, value: bytes, pttl: int):
+        """Store an encoded payload in the in-process cache, evicting the least recently used"""
+        # PTTL is the Redis entry's remaining lifetime in ms: -1 without an
+        # expiry, -2 once it is gone
+        if pttl == -2:
+            return
+        ttl = self.l1_ttl if pttl == -1 else min(self.l1_ttl, pttl / 1000)
+        self._l1[key] = (time.monotonic() + ttl, value)
+        self._l1.move_to_end(key)
+        if len(self._l1) > self.l1_max_size:
+            self._l1.popitem(last=False)
+    
+    def _count(self, field: str, amount: int = 1):
+        """Record a statistics delta to be flushed to Redis"""
+        if amount:
+            self._stat_deltas[field] = self._stat_deltas.get(field, 0) + amount
+    
+    def _count_hit(self, key: str):
+        """Record a hit on key for eviction scoring"""
+        if self.max_entries:
+            self._hit_deltas[key] = self._hit_deltas.get(key, 0) + 1
+    
+    def _queue_stat_deltas(self, pipe):
+        """Append pending statistics and hit-count deltas to a pipeline"""
+        deltas, self._stat_deltas = self._stat_deltas, {}
+        for field, amount in deltas.items():
+            pipe.hincrby(self.stats_key, field, amount)
+        
+        hits, self._hit_deltas = self._hit_deltas, {}
+        for key, amount in hits.items():
+            # XX: never resurrect members that were evicted or deleted
+            pipe.zadd(self.eviction_key, {key: amount}, xx=True, incr=True)
+    
+    async def _coalesced_get(self, key: str) -> Optional[Any]:
+        """Queue a get to be served by the next batched MGET"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((key, future))
+        if len(self._pending) == 1:
+            loop.call_soon(self._start_flush)
+        return await future
+    
+    def _start_flush(self):
+        """Start a batched MGET, holding a reference until it finishes"""
+        task = asyncio.ensure_future(self._flush_pending())
+        self._flush_tasks.add(task)
+        task.add_done_callback(self._flush_tasks.discard)
+    
+    async def _flush_pending(self):
+        """Resolve all queued gets with a single MGET"""
+        pending, self._pending = self._pending, []
+        try:
+            values = await self.get_many([key for key, _ in pending])
+        except Exception as e:
+            # Waiters must not hang on a failed batch
+            for _, future in pending:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), value in zip(pending, values):
+            if not future.done():
+                future.set_result(value)
+    
     async def set(
         self,
         key: str,
@@ -67,26 +300,66 @@ class CacheService:
             return False
         
         try:
+            self._l1.pop(key, None)
             full_key = f"{self.prefix}{key}"
             ttl = ttl or settings.CACHE_TTL
             
-            serialized = json.dumps(value)
-            await self.redis.setex(full_key, ttl, serialized)
+            serialized = _encode(value)
+            if not self.max_entries:
+                await self.redis.setex(full_key, ttl, serialized)
+                return True
+            
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.setex(full_key, ttl, serialized)
+                self._queue_index_entries(pipe, [key], ttl)
+                entry_count = (await pipe.execute())[-1]
+            
+            await self._enforce_budget(entry_count)
             return True
             
         except Exception as e:
-            self.errors += 1
+            self._count("errors")
             logger.warning(f"Cache set error: {e}")
             return False
     
+    async def set_many(self, items: Dict[str, Any], ttl: Optional[int] = None) -> bool:
+        """Set several values in cache in one pipelined round-trip"""
+        if not self.redis:
+            return False
+        
+        try:
+            ttl = ttl or settings.CACHE_TTL
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for key, value in items.items():
+                    self._l1.pop(key, None)
+                    pipe.setex(f"{self.prefix}{key}", ttl, _encode(value))
+                if self.max_entries and items:
+                    self._queue_index_entries(pipe, list(items), ttl)
+                results = await pipe.execute()
+            
+            if self.max_entries and items:
+                await self._enforce_budget(results[-1])
+            return True
+            
+        except Exception as e:
+            self._count("errors")
+            logger.warning(f"Cache set_many error: {e}")
+            return False
+    
     async def delete(self, key: str) -> bool:
         """Delete value from cache"""
         if not self.redis:
             return False
         
         try:
+            self._l1.pop(key, None)
             full_key = f"{self.prefix}{key}"
-            await self.redis.delete(full_key)
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.delete(full_key)
+                if self.max_entries:
+                    pipe.zrem(self.eviction_key, key)
+                    pipe.zrem(self.expiry_key, key)
+                await pipe.execute()
             return True
         except Exception as e:
             logger.warning(f"Cache delete error: {e}")
@@ -98,50 +371,147 @@ class CacheService:
             return 0
         
         try:
+            for key in [key for key in self._l1 if key.startswith(prefix)]:
+                del self._l1[key]
+            
             pattern = f"{self.prefix}{prefix}*"
-            keys = await self.redis.keys(pattern)
+            deleted = 0
+            batch = []
+            
+            async for key in self.redis.scan_iter(match=pattern, count=1000):
+                batch.append(key)
+                if len(batch) >= self.delete_batch_size:
+                    deleted += await self._unlink_batch(batch)
+                    batch = []
             
-            if keys:
-                await self.redis.delete(*keys)
+            if batch:
+                deleted += await self._unlink_batch(batch)
             
-            return len(keys)
+            return deleted
         except Exception as e:
             logger.error(f"Cache clear error: {e}")
             return 0
     
+    async def _unlink_batch(self, keys: list) -> int:
+        """Unlink keys in one pipelined round-trip; memory is freed off-thread by Redis"""
+        prefix = self.prefix.encode()
+        members = [key[len(prefix):] for key in keys if key.startswith(prefix)]
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.unlink(*keys)
+            if members and self.max_entries:
+                pipe.zrem(self.eviction_key, *members)
+                pipe.zrem(self.expiry_key, *members)
+            await pipe.execute()
+        return len(keys)
+    
+    def _queue_index_entries(self, pipe, keys: List[str], ttl: int):
+        """Append eviction and expiry index updates for new entries to a pipeline"""
+        now = time.time()
+        # NX: re-setting a key keeps the hits it has accumulated. The
+        # fractional part (< 1 until 2286) ranks older entries first on ties.
+        pipe.zadd(self.eviction_key, {key: 1 + now / 1e10 for key in keys}, nx=True)
+        pipe.zadd(self.expiry_key, {key: now + ttl for key in keys})
+        pipe.zcard(self.eviction_key)
+    
+    async def _enforce_budget(self, entry_count: int):
+        """Evict entries once the count exceeds max_entries"""
+        if entry_count > self.max_entries:
+            # Evict 1% past the budget so the following writes do not each
+            # pay for an eviction round
+            await self._evict(entry_count - self.max_entries + self.max_entries // 100)
+    
+    async def _prune_expired(self) -> int:
+        """Drop index members whose entry has expired by TTL"""
+        now = time.time()
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.zrangebyscore(self.expiry_key, "-inf", now)
+            pipe.zremrangebyscore(self.expiry_key, "-inf", now)
+            expired = (await pipe.execute())[0]
+        if expired:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for start in range(0, len(expired), self.delete_batch_size):
+                    pipe.zrem(self.eviction_key, *expired[start:start + self.delete_batch_size])
+                await pipe.execute()
+        return len(expired)
+    
+    async def _evict(self, count: int):
+        """Evict the count lowest-scored entries"""
+        # Expired members count against the budget but free nothing; drop
+        # them first so ZPOPMIN only reaches live entries
+        count -= await self._prune_expired()
+        if count <= 0:
+            return
+        
+        popped = await self.redis.zpopmin(self.eviction_key, count)
+        keys = [member.decode() for member, _ in popped]
+        for key in keys:
+            self._l1.pop(key, None)
+        if keys:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.unlink(*[f"{self.prefix}{key}" for key in keys])
+                pipe.zrem(self.expiry_key, *keys)
+                await pipe.execute()
+            self._count("evictions", len(keys))
+    
     async def get_stats(self) -> Dict[str, Any]:
         """Get cache statistics"""
         if not self.redis:
             return {"status": "disconnected"}
         
         try:
-            # Get Redis info
-            info = await self.redis.info()
+            async with self.redis.pipeline(transaction=False) as pipe:
+                self._queue_stat_deltas(pipe)
+                pipe.hgetall(self.stats_key)
+                counters = (await pipe.execute())[-1]
             
-            # Count keys with our prefix
-            pattern = f"{self.prefix}*"
-            keys = await self.redis.keys(pattern)
+            hits = int(counters.get(b"hits", 0))
+            misses = int(counters.get(b"misses", 0))
+            server_stats = await self._get_server_stats()
             
             return {
                 "status": "connected",
-                "hits": self.hits,
-                "misses": self.misses,
-                "errors": self.errors,
+                "hits": hits,
+                "misses": misses,
+                "errors": int(counters.get(b"errors", 0)),
+                "evictions": int(counters.get(b"evictions", 0)),
                 "hit_rate": (
-                    self.hits / (self.hits + self.misses) * 100
-                    if (self.hits + self.misses) > 0 else 0
+                    hits / (hits + misses) * 100
+                    if (hits + misses) > 0 else 0
                 ),
-                "key_count": len(keys),
-                "memory_used": info.get("used_memory_human", "N/A"),
-                "connections": info.get("connected_clients", 0),
-                "uptime": info.get("uptime_in_seconds", 0),
+                **server_stats,
             }
         except Exception as e:
             logger.warning(f"Cache stats error: {e}")
             return {"status": "error", "error": str(e)}
     
+    async def _get_server_stats(self) -> Dict[str, Any]:
+        """Get Redis server stats, reusing a recent snapshot within stats_ttl"""
+        now = time.monotonic()
+        if self._server_stats and now - self._server_stats[0] < self.stats_ttl:
+            return self._server_stats[1]
+        
+        # Get Redis info
+        info = await self.redis.info()
+        
+        # Cache entries only; the database is shared with Celery and holds
+        # the internal stats and index keys too, so DBSIZE would overcount.
+        # Entries are only indexed when there is an entry budget.
+        key_count = None
+        if self.max_entries:
+            await self._prune_expired()
+            key_count = await self.redis.zcard(self.eviction_key)
+        
+        stats = {
+            "key_count": key_count,
+            "memory_used": info.get("used_memory_human", "N/A"),
+            "connections": info.get("connected_clients", 0),
+            "uptime": info.get("uptime_in_seconds", 0),
+        }
+        self._server_stats = (now, stats)
+        return stats
+    
     async def close(self):
         """Close Redis connection"""
         if self.redis:
-            await self.redis.close()
+            await self.redis.aclose()
             logger.info("Cache service closed")
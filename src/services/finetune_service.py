@@ -1,14 +1,17 @@
 import os
-import json
-import shutil
 from typing import Dict, Any, List, Optional
 from datetime import datetime
 from pathlib import Path
 import asyncio
-from concurrent.futures import ProcessPoolExecutor
+import atexit
+import functools
+import importlib.util
+import multiprocessing
+import pickle
+import secrets
 import subprocess
-import tempfile
 
+import orjson
 import pandas as pd
 from loguru import logger
 from sqlalchemy.orm import Session
@@ -19,12 +22,173 @@ from src.database.models import FinetuneJob as FinetuneJobModel
 from src.database.crud import update_finetune_job
 
 
+def format_conversation(conversation: List[Dict[str, Any]]) -> str:
+    """Render a conversation as training text"""
+    return "".join(f"{msg['role']}: {msg['content']}\n" for msg in conversation)
+
+
+def iter_jsonl_conversations(path: str):
+    """Yield formatted training texts from a .jsonl dataset one line at a time"""
+    with open(path, "rb") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            item = orjson.loads(line)
+            if "conversations" in item:
+                conversation = item["conversations"]
+            elif "messages" in item:
+                conversation = item["messages"]
+            else:
+                # Assume it's already in the right format
+                conversation = item
+            yield {"text": format_conversation(conversation)}
+
+
+@functools.lru_cache(maxsize=32)
+def modelfile_content(base_model: str) -> bytes:
+    """Ollama Modelfile for a fine-tune of base_model"""
+    return f"""FROM {base_model}
+
+# System prompt
+SYSTEM You are a fine-tuned version of {base_model}
+
+# Copy fine-tuned weights
+COPY ./pytorch_model.bin /pytorch_model.bin
+COPY ./adapter_config.json /adapter_config.json
+COPY ./adapter_model.bin /adapter_model.bin
+
+# Parameters
+PARAMETER temperature 0.7
+PARAMETER top_p 0.9
+""".encode()
+
+
+def _training_worker_main(conn):
+    """Training process loop; torch stays imported and base models stay loaded between jobs"""
+    model_cache: Dict[str, Any] = {}
+    while True:
+        try:
+            config_path, job_id = pickle.loads(conn.recv_bytes())
+        except EOFError:
+            break
+        result = FinetuneService._train_model(config_path, job_id, model_cache)
+        conn.send_bytes(pickle.dumps((job_id, result)))
+
+
+class TrainingWorker:
+    """Long-lived training subprocess shared by all FinetuneService instances"""
+    
+    def __init__(self):
+        self._conn = None
+        self._process = None
+        self._lock: Optional[asyncio.Lock] = None
+    
+    def _ensure_started(self):
+        """Spawn the training process if it is not running"""
+        if self._process is not None and self._process.is_alive():
+            return
+        
+        ctx = multiprocessing.get_context("spawn")
+        self._conn, child_conn = ctx.Pipe()
+        self._process = ctx.Process(
+            target=_training_worker_main,
+            args=(child_conn,),
+            name="finetune-worker",
+        )
+        self._process.start()
+        child_conn.close()
+    
+    def _round_trip(self, request: bytes) -> bytes:
+        """Send a job and wait for its reply on one executor thread"""
+        self._conn.send_bytes(request)
+        return self._conn.recv_bytes()
+    
+    async def train(self, config_path: str, job_id: int) -> Dict[str, Any]:
+        """Run a training job in the worker process"""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        
+        await self._lock.acquire()
+        try:
+            self._ensure_started()
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(
+                None, self._round_trip, pickle.dumps((config_path, job_id))
+            )
+        except BaseException:
+            self._lock.release()
+            raise
+        # The pipe stays held until the reply is read, even if this task is
+        # cancelled, so the next job can never receive this job's result
+        future.add_done_callback(lambda _: self._lock.release())
+        
+        try:
+            reply_job_id, result = pickle.loads(await asyncio.shield(future))
+        except (EOFError, OSError) as e:
+            self._process = None
+            return {"success": False, "error": f"Training worker exited: {e}"}
+        if reply_job_id != job_id:
+            return {"success": False, "error": f"Training worker replied for job {reply_job_id}"}
+        return result
+    
+    def close(self):
+        """Stop the worker process"""
+        if self._process is not None:
+            self._conn.close()
+            self._process.join(timeout=10)
+            if self._process.is_alive():
+                self._process.terminate()
+            self._process = None
+
+
+training_worker = TrainingWorker()
+atexit.register(training_worker.close)
+
+
+class FinetuneJobQueue:
+    """Bounded queue of fine-tuning jobs drained by a single background task"""
+    
+    def __init__(self, maxsize: int = 64):
+        self.maxsize = maxsize
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+    
+    def full(self) -> bool:
+        """Whether a new job would be rejected"""
+        return self._queue is not None and self._queue.full()
+    
+    def put_nowait(self, job_id: int):
+        """Enqueue a job; raises asyncio.QueueFull when the backlog is full"""
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.maxsize)
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+        self._queue.put_nowait(job_id)
+    
+    async def _run(self):
+        """Run queued jobs one at a time, each with its own database session"""
+        from src.database.session import SessionLocal
+        
+        while True:
+            job_id = await self._queue.get()
+            db = SessionLocal()
+            try:
+                await FinetuneService(db)._run_finetune_job(job_id)
+            except Exception as e:
+                logger.exception(f"Unhandled error in finetune job {job_id}: {e}")
+            finally:
+                db.close()
+                self._queue.task_done()
+
+
+job_queue = FinetuneJobQueue()
+
+
 class FinetuneService:
     """Service for fine-tuning LLM models"""
     
     def __init__(self, db_session: Session):
         self.db = db_session
-        self.executor = ProcessPoolExecutor(max_workers=2)
         self.finetune_path = Path(settings.FINETUNE_STORAGE_PATH)
         self.finetune_path.mkdir(parents=True, exist_ok=True)
         
@@ -49,9 +213,13 @@ class FinetuneService:
         target_modules: Optional[List[str]] = None,
         new_model_name: Optional[str] = None
     ) -> FinetuneJob:
-        """Create a new fine-tuning job"""
+        """Create a new fine-tuning job; raises asyncio.QueueFull when the backlog is full"""
         from src.database.crud import create_finetune_job as create_job
         
+        # Reject before creating the record rather than leaving it pending
+        if job_queue.full():
+            raise asyncio.QueueFull
+        
         # Generate model name if not provided
         if not new_model_name:
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -74,8 +242,8 @@ class FinetuneService:
         
         job = create_job(self.db, job_data)
         
-        # Start training asynchronously
-        asyncio.create_task(self._run_finetune_job(job.id))
+        # Queue training; nothing awaited since the full() check, so this fits
+        job_queue.put_nowait(job.id)
         
         return FinetuneJob.from_orm(job)
     
@@ -113,17 +281,10 @@ class FinetuneService:
             
             # Save config
             config_path = self.finetune_path / f"{job.new_model_name}_config.json"
-            with open(config_path, "w") as f:
-                json.dump(config, f, indent=2)
-            
-            # Run training (in separate process)
-            loop = asyncio.get_event_loop()
-            result = await loop.run_in_executor(
-                self.executor,
-                self._train_model,
-                config_path,
-                job.id
-            )
+            await asyncio.to_thread(config_path.write_bytes, orjson.dumps(config))
+            
+            # Run training (in the persistent worker process)
+            result = await training_worker.train(str(config_path), job.id)
             
             # Update job status
             if result["success"]:
@@ -169,6 +330,10 @@ class FinetuneService:
     
     async def _prepare_dataset(self, dataset_path: str, base_model: str) -> Dict[str, Any]:
         """Prepare dataset for fine-tuning"""
+        return await asyncio.to_thread(self._load_dataset, dataset_path)
+    
+    def _load_dataset(self, dataset_path: str) -> Dict[str, Any]:
+        """Read a dataset file into formatted training texts (blocking)"""
         path = Path(dataset_path)
         
         if not path.exists():
@@ -176,40 +341,31 @@ class FinetuneService:
         
         # Support multiple formats
         if path.suffix == ".jsonl":
-            with open(path, "r") as f:
-                lines = [json.loads(line) for line in f]
-            
-            # Convert to conversation format
-            conversations = []
-            for item in lines:
-                if "conversations" in item:
-                    conversations.append(item["conversations"])
-                elif "messages" in item:
-                    conversations.append(item["messages"])
-                else:
-                    # Assume it's already in the right format
-                    conversations.append(item)
+            # Records are streamed from disk at training time instead of
+            # being held in memory and embedded in the config file
+            with open(path, "rb") as f:
+                size = sum(1 for line in f if line.strip())
             
             return {
-                "format": "conversation",
-                "data": conversations,
-                "size": len(conversations),
+                "format": "text",
+                "path": str(path),
+                "size": size,
             }
         
         elif path.suffix == ".csv":
-            df = pd.read_csv(path)
             # Assume columns: prompt, completion
-            conversations = []
-            for _, row in df.iterrows():
-                conversations.append([
-                    {"role": "user", "content": row["prompt"]},
-                    {"role": "assistant", "content": row["completion"]}
-                ])
+            df = pd.read_csv(path, usecols=["prompt", "completion"])
+            texts = [
+                f"user: {prompt}\nassistant: {completion}\n"
+                for prompt, completion in zip(
+                    df["prompt"].tolist(), df["completion"].tolist()
+                )
+            ]
             
             return {
-                "format": "conversation",
-                "data": conversations,
-                "size": len(conversations),
+                "format": "text",
+                "data": texts,
+                "size": len(texts),
             }
         
         else:
@@ -245,6 +401,9 @@ class FinetuneService:
                 "load_best_model_at_end": True,
                 "metric_for_best_model": "loss",
                 "greater_is_better": False,
+                "gradient_checkpointing": True,
+                "gradient_checkpointing_kwargs": {"use_reentrant": False},
+                "group_by_length": True,
             },
             "lora_config": {
                 "r": lora_rank,
@@ -290,8 +449,16 @@ class FinetuneService:
         config["training_args"]["learning_rate"] = kwargs["learning_rate"] * 0.1  # Lower LR for full finetune
         return config
     
-    def _train_model(self, config_path: str, job_id: int) -> Dict[str, Any]:
+    @staticmethod
+    def _train_model(
+        config_path: str,
+        job_id: int,
+        model_cache: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
         """Train model using transformers/peft"""
+        if model_cache is None:
+            model_cache = {}
+        
         try:
             import torch
             from transformers import (
@@ -305,43 +472,85 @@ class FinetuneService:
             from datasets import Dataset
             
             # Load config
-            with open(config_path, "r") as f:
-                config = json.load(f)
+            with open(config_path, "rb") as f:
+                config = orjson.loads(f.read())
             
-            # Load model and tokenizer
+            # bf16 where supported; LoRA then trains on a 4-bit NF4 base (QLoRA)
+            use_cuda = torch.cuda.is_available()
+            use_bf16 = use_cuda and torch.cuda.is_bf16_supported()
+            quantize = use_bf16 and config["model_type"] == "lora"
+            
+            # Load model and tokenizer, reusing ones left by a previous PEFT
+            # job. Cached bases are frozen, so full fine-tunes always load fresh.
             model_name = config["base_model"].replace("ollama/", "")
-            tokenizer = AutoTokenizer.from_pretrained(model_name)
-            model = AutoModelForCausalLM.from_pretrained(
-                model_name,
-                torch_dtype=torch.float16 if torch.cuda.is_available() else torch.float32,
-                device_map="auto" if torch.cuda.is_available() else None,
-            )
+            cache_key = f"{model_name}:4bit" if quantize else f"{model_name}:peft"
+            cached = None
+            if config["model_type"] != "full":
+                cached = model_cache.pop(cache_key, None)
+            # Keep at most one base model resident on the GPU
+            model_cache.clear()
+            if cached is not None:
+                model, tokenizer = cached
+            else:
+                load_kwargs = {
+                    "torch_dtype": (
+                        torch.bfloat16 if use_bf16
+                        else torch.float16 if use_cuda
+                        else torch.float32
+                    ),
+                    "device_map": "auto" if use_cuda else None,
+                }
+                if use_cuda and importlib.util.find_spec("flash_attn") is not None:
+                    load_kwargs["attn_implementation"] = "flash_attention_2"
+                if quantize:
+                    from transformers import BitsAndBytesConfig
+                    load_kwargs["quantization_config"] = BitsAndBytesConfig(
+                        load_in_4bit=True,
+                        bnb_4bit_compute_dtype=torch.bfloat16,
+                        bnb_4bit_quant_type="nf4",
+                        bnb_4bit_use_double_quant=True,
+                    )
+                
+                tokenizer = AutoTokenizer.from_pretrained(model_name, use_fast=True)
+                model = AutoModelForCausalLM.from_pretrained(model_name, **load_kwargs)
+                
+                if quantize:
+                    from peft import prepare_model_for_kbit_training
+                    model = prepare_model_for_kbit_training(model)
             
             # Add padding token if not present
             if tokenizer.pad_token is None:
                 tokenizer.pad_token = tokenizer.eos_token
             
             # Prepare dataset
+            # Texts are formatted when the dataset is prepared, so this only tokenizes
             def tokenize_function(examples):
-                texts = []
-                for conv in examples["conversations"]:
-                    text = ""
-                    for msg in conv:
-                        text += f"{msg['role']}: {msg['content']}\n"
-                    texts.append(text)
-                
+                # No padding here; the collator pads each batch to its longest row
                 return tokenizer(
-                    texts,
+                    examples["text"],
                     truncation=True,
-                    padding="max_length",
-                    max_length=512,
+                    max_length=config["data_collator"]["max_length"],
                 )
             
-            dataset_dict = {
-                "conversations": config["dataset"]["data"]
-            }
-            dataset = Dataset.from_dict(dataset_dict)
-            tokenized_dataset = dataset.map(tokenize_function, batched=True)
+            if "path" in config["dataset"]:
+                dataset = Dataset.from_generator(
+                    iter_jsonl_conversations,
+                    gen_kwargs={"path": config["dataset"]["path"]},
+                )
+            else:
+                dataset_dict = {
+                    "text": config["dataset"]["data"]
+                }
+                dataset = Dataset.from_dict(dataset_dict)
+            tokenized_dataset = dataset.map(
+                tokenize_function,
+                batched=True,
+                batch_size=1000,
+                num_proc=max(1, (os.cpu_count() or 1) // 2),
+                remove_columns=["text"],
+                load_from_cache_file=True,
+                desc="tokenize",
+            )
             
             # Apply PEFT if needed
             if config["model_type"] in ["lora", "p_tuning", "prefix_tuning"]:
@@ -367,12 +576,19 @@ class FinetuneService:
                 model.print_trainable_parameters()
             
             # Training arguments
-            training_args = TrainingArguments(**config["training_args"])
+            training_args_config = dict(config["training_args"])
+            if use_bf16:
+                training_args_config.update(bf16=True, tf32=True)
+            training_args = TrainingArguments(**training_args_config)
+            
+            # KV cache is unused in training and conflicts with checkpointing
+            model.config.use_cache = False
             
             # Data collator
             data_collator = DataCollatorForLanguageModeling(
                 tokenizer=tokenizer,
                 mlm=False,
+                pad_to_multiple_of=8,
             )
             
             # Trainer
@@ -396,7 +612,14 @@ class FinetuneService:
             metrics["train_samples"] = len(tokenized_dataset)
             
             # Create Modelfile for Ollama
-            self._create_modelfile(output_dir, config["base_model"])
+            FinetuneService._create_modelfile(output_dir, config["base_model"])
+            
+            # Keep the untouched, frozen base model for the next PEFT job on
+            # it. Full fine-tunes rewrite the base weights, so they are not reused.
+            if config["model_type"] == "lora":
+                model_cache[cache_key] = (model.unload(), tokenizer)
+            elif config["model_type"] in ["p_tuning", "prefix_tuning"]:
+                model_cache[cache_key] = (model.get_base_model(), tokenizer)
             
             return {
                 "success": True,
@@ -412,56 +635,65 @@ class FinetuneService:
                 "error": str(e),
             }
     
-    def _create_modelfile(self, model_dir: Path, base_model: str):
+    @staticmethod
+    def _create_modelfile(model_dir: Path, base_model: str):
         """Create Modelfile for Ollama"""
-        modelfile_content = f"""FROM {base_model}
-
-# System prompt
-SYSTEM You are a fine-tuned version of {base_model}
-
-# Copy fine-tuned weights
-COPY ./pytorch_model.bin /pytorch_model.bin
-COPY ./adapter_config.json /adapter_config.json
-COPY ./adapter_model.bin /adapter_model.bin
-
-# Parameters
-PARAMETER temperature 0.7
-PARAMETER top_p 0.9
-"""
-        
-        with open(model_dir / "Modelfile", "w") as f:
-            f.write(modelfile_content)
+        (model_dir / "Modelfile").write_bytes(modelfile_content(base_model))
     
     async def _push_to_ollama(self, model_name: str, model_path: str):
         """Push fine-tuned model to Ollama"""
         try:
             import httpx
             
-            # Create a temporary tar file
-            import tarfile
-            temp_dir = Path(tempfile.mkdtemp())
-            tar_path = temp_dir / f"{model_name}.tar"
+            # Stream the tarball straight into the multipart request body
+            boundary = secrets.token_hex(16)
+            head = (
+                f'--{boundary}\r\n'
+                f'Content-Disposition: form-data; name="name"\r\n\r\n'
+                f'{model_name}\r\n'
+                f'--{boundary}\r\n'
+                f'Content-Disposition: form-data; name="file"; filename="{model_name}.tar"\r\n'
+                f'Content-Type: application/x-tar\r\n\r\n'
+            ).encode()
+            tail = f'\r\n--{boundary}--\r\n'.encode()
             
-            with tarfile.open(tar_path, "w") as tar:
-                tar.add(model_path, arcname=os.path.basename(model_path))
+            loop = asyncio.get_running_loop()
+            read_fd, write_fd = os.pipe()
+            reader = os.fdopen(read_fd, "rb")
+            
+            def write_tarball():
+                import tarfile
+                with os.fdopen(write_fd, "wb") as writer:
+                    with tarfile.open(fileobj=writer, mode="w|") as tar:
+                        tar.add(model_path, arcname=os.path.basename(model_path))
+            
+            writer_future = loop.run_in_executor(None, write_tarball)
+            
+            async def body():
+                yield head
+                while chunk := await loop.run_in_executor(None, reader.read, 65536):
+                    yield chunk
+                # Surface tar errors instead of sending a truncated archive
+                await writer_future
+                yield tail
             
             # Push to Ollama
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                with open(tar_path, "rb") as f:
-                    files = {"file": (f"{model_name}.tar", f, "application/x-tar")}
+            try:
+                async with httpx.AsyncClient(timeout=30.0) as client:
                     response = await client.post(
                         f"{settings.OLLAMA_BASE_URL}/api/create",
-                        files=files,
-                        data={"name": model_name}
+                        content=body(),
+                        headers={"Content-Type": f"multipart/form-data; boundary={boundary}"},
                     )
-                
-                if response.status_code == 200:
-                    logger.info(f"Model {model_name} pushed to Ollama successfully")
-                else:
-                    logger.error(f"Failed to push model to Ollama: {response.text}")
+            finally:
+                # Unblocks the writer thread if the upload stopped early
+                reader.close()
+                await asyncio.gather(writer_future, return_exceptions=True)
             
-            # Cleanup
-            shutil.rmtree(temp_dir)
+            if response.status_code == 200:
+                logger.info(f"Model {model_name} pushed to Ollama successfully")
+            else:
+                logger.error(f"Failed to push model to Ollama: {response.text}")
             
         except Exception as e:
             logger.error(f"Error pushing model to Ollama: {e}")
@@ -1,9 +1,9 @@
 import asyncio
-import json
-import hashlib
+import functools
 from typing import Optional, Dict, Any, List, AsyncGenerator
-from datetime import datetime
 import httpx
+import orjson
+import xxhash
 from loguru import logger
 from tenacity import retry, stop_after_attempt, wait_exponential
 
@@ -13,14 +13,81 @@ from src.services.load_balancer import LoadBalancer
 from src.utils.code_extractor import CodeExtractor
 
 
+async def iter_json_lines(response: httpx.Response) -> AsyncGenerator[Dict[str, Any], None]:
+    """Parse newline-delimited JSON from a streamed response without str decoding"""
+    # Pieces of the current unterminated line, joined once it completes so
+    # long lines are not re-scanned on every chunk
+    partial: List[bytes] = []
+    async for chunk in response.aiter_bytes():
+        *lines, tail = chunk.split(b"\n")
+        if lines:
+            partial.append(lines[0])
+            lines[0] = b"".join(partial)
+            partial = []
+        if tail:
+            partial.append(tail)
+        for line in lines:
+            if line.strip():
+                try:
+                    yield orjson.loads(line)
+                except orjson.JSONDecodeError:
+                    continue
+    buffer = b"".join(partial)
+    if buffer.strip():
+        try:
+            yield orjson.loads(buffer)
+        except orjson.JSONDecodeError:
+            pass
+
+
+_JSON_HEADERS = {"content-type": "application/json"}
+
+
+@functools.lru_cache(maxsize=256)
+def _generate_envelope(model: str, stream: bool, temperature: float, max_tokens: int) -> bytes:
+    """Encoded /api/generate body up to the prompt value, reused across requests"""
+    envelope = orjson.dumps({
+        "model": model,
+        "stream": stream,
+        "options": {
+            "temperature": temperature,
+            "num_predict": max_tokens,
+        }
+    })
+    # Reopen the object so the prompt can be appended as the last member
+    return envelope[:-1] + b',"prompt":'
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Canonical form for cache lookups: surrounding whitespace trimmed"""
+    # Case and inner whitespace are kept; identifiers and indentation change
+    # what a code prompt means
+    return prompt.strip()
+
+
 class LLMService:
     """Robust LLM service with load balancing and caching"""
     
     def __init__(self):
         self.cache_service = CacheService()
-        self.load_balancer = LoadBalancer()
         self.code_extractor = CodeExtractor()
-        self.http_client = httpx.AsyncClient(timeout=30.0)
+        # Pool limits and HTTP/2 are transport options once a transport is given
+        self.http_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(settings.HTTP_TIMEOUT, connect=settings.HTTP_CONNECT_TIMEOUT),
+            transport=httpx.AsyncHTTPTransport(
+                retries=0,
+                http2=settings.HTTP2_ENABLED,
+                limits=httpx.Limits(
+                    max_connections=settings.HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY,
+                ),
+            ),
+        )
+        self.load_balancer = LoadBalancer(http_client=self.http_client)
+        # Bounds concurrent per-instance requests when fanning out; created
+        # on first use so it binds to the serving loop
+        self._fanout_semaphore: Optional[asyncio.Semaphore] = None
         
         # Statistics
         self.stats = {
@@ -37,13 +104,25 @@ class LLMService:
     
     async def close(self):
         """Cleanup resources"""
-        await self.http_client.aclose()
         await self.load_balancer.close()
+        await self.http_client.aclose()
     
-    def _generate_cache_key(self, prompt: str, model: str, **kwargs) -> str:
+    def _generate_cache_key(
+        self,
+        prompt: str,
+        model: str,
+        temperature: float,
+        max_tokens: int
+    ) -> str:
         """Generate cache key for prompt"""
-        key_data = f"{model}:{prompt}:{json.dumps(kwargs, sort_keys=True)}"
-        return hashlib.sha256(key_data.encode()).hexdigest()
+        # Keys are internal, so a fast non-cryptographic hash is enough.
+        # xxh3 is unseeded, so keys match across workers.
+        h = xxhash.xxh3_128()
+        h.update(f"{model}\0{temperature}\0{max_tokens}\0".encode())
+        if settings.CACHE_NORMALIZE_PROMPTS:
+            prompt = normalize_prompt(prompt)
+        h.update(prompt.encode())
+        return h.hexdigest()
     
     @retry(
         stop=stop_after_attempt(3),
@@ -67,12 +146,9 @@ class LLMService:
         max_tokens = max_tokens or settings.MAX_TOKENS
         
         # Check cache
+        cache_key = None
         if cache and not stream:
-            cache_key = self._generate_cache_key(
-                prompt, model,
-                temperature=temperature,
-                max_tokens=max_tokens
-            )
+            cache_key = self._generate_cache_key(prompt, model, temperature, max_tokens)
             cached = await self.cache_service.get(cache_key)
             if cached:
                 self.stats["cache_hits"] += 1
@@ -80,111 +156,112 @@ class LLMService:
                 yield cached
                 return
         
-        # Get instance from load balancer
-        instance = await self.load_balancer.get_instance()
-        
-        # Prepare request
-        url = f"{instance.url}/api/generate"
-        payload = {
-            "model": model,
-            "prompt": prompt,
-            "stream": stream,
-            "options": {
-                "temperature": temperature,
-                "num_predict": max_tokens,
-            }
-        }
-        
-        try:
-            start_time = datetime.now()
+        # Lease an instance; its connection slot is released on every exit path
+        async with self.load_balancer.lease_instance() as instance:
+            # Prepare request
+            url = f"{instance.url}/api/generate"
+            body = (
+                _generate_envelope(model, stream, temperature, max_tokens)
+                + orjson.dumps(prompt)
+                + b"}"
+            )
             
-            if stream:
-                async with self.http_client.stream("POST", url, json=payload) as response:
+            try:
+                loop = asyncio.get_running_loop()
+                start_time = loop.time()
+                
+                if stream:
+                    async with self.http_client.stream(
+                        "POST", url, content=body, headers=_JSON_HEADERS
+                    ) as response:
+                        response.raise_for_status()
+                        full_response = ""
+                        
+                        async for data in iter_json_lines(response):
+                            if "response" in data:
+                                chunk = data["response"]
+                                full_response += chunk
+                                yield chunk
+                            if data.get("done", False):
+                                # Update instance metrics
+                                await self.load_balancer.update_metrics(
+                                    instance.instance_id,
+                                    success=True,
+                                    response_time=loop.time() - start_time,
+                                    tokens_used=data.get("total_tokens", 0)
+                                )
+                                self.stats["total_tokens"] += data.get("total_tokens", 0)
+                                break
+                else:
+                    response = await self.http_client.post(url, content=body, headers=_JSON_HEADERS)
                     response.raise_for_status()
-                    full_response = ""
+                    data = response.json()
                     
-                    async for line in response.aiter_lines():
-                        if line.strip():
-                            try:
-                                data = json.loads(line)
-                                if "response" in data:
-                                    chunk = data["response"]
-                                    full_response += chunk
-                                    yield chunk
-                                if data.get("done", False):
-                                    # Update instance metrics
-                                    await self.load_balancer.update_metrics(
-                                        instance.id,
-                                        success=True,
-                                        response_time=(datetime.now() - start_time).total_seconds(),
-                                        tokens_used=data.get("total_tokens", 0)
-                                    )
-                                    self.stats["total_tokens"] += data.get("total_tokens", 0)
-                                    break
-                            except json.JSONDecodeError:
-                                continue
-            else:
-                response = await self.http_client.post(url, json=payload)
-                response.raise_for_status()
-                data = response.json()
-                
-                full_response = data.get("response", "")
-                processing_time = (datetime.now() - start_time).total_seconds()
-                
-                # Update instance metrics
-                await self.load_balancer.update_metrics(
-                    instance.id,
-                    success=True,
-                    response_time=processing_time,
-                    tokens_used=data.get("total_tokens", 0)
-                )
-                
-                self.stats["total_tokens"] += data.get("total_tokens", 0)
-                
-                # Cache the response
-                if cache:
-                    cache_key = self._generate_cache_key(
-                        prompt, model,
-                        temperature=temperature,
-                        max_tokens=max_tokens
+                    full_response = data.get("response", "")
+                    processing_time = loop.time() - start_time
+                    
+                    # Update instance metrics
+                    await self.load_balancer.update_metrics(
+                        instance.instance_id,
+                        success=True,
+                        response_time=processing_time,
+                        tokens_used=data.get("total_tokens", 0)
                     )
-                    await self.cache_service.set(cache_key, full_response, ttl=settings.CACHE_TTL)
+                    
+                    self.stats["total_tokens"] += data.get("total_tokens", 0)
+                    
+                    # Cache the response
+                    if cache_key is not None:
+                        await self.cache_service.set(
+                            cache_key, full_response,
+                            ttl=settings.CACHE_TTL
+                        )
+                    
+                    yield full_response
+            
+            except Exception as e:
+                self.stats["errors"] += 1
+                logger.error(f"Error generating with instance {instance.instance_id}: {e}")
                 
-                yield full_response
+                # Mark instance as unhealthy
+                await self.load_balancer.mark_unhealthy(instance.instance_id)
                 
-        except Exception as e:
-            self.stats["errors"] += 1
-            logger.error(f"Error generating with instance {instance.id}: {e}")
-            
-            # Mark instance as unhealthy
-            await self.load_balancer.mark_unhealthy(instance.id)
-            
-            # Retry with another instance
-            if not stream:
-                raise
-            else:
-                yield f"Error: Failed to generate response. {str(e)}"
+                # Retry with another instance
+                if not stream:
+                    raise
+                else:
+                    yield f"Error: Failed to generate response. {str(e)}"
     
     async def get_available_models(self, instance_id: Optional[str] = None) -> List[Dict[str, Any]]:
         """Get available models from Ollama instances"""
-        models = []
-        
         if instance_id:
             instances = [await self.load_balancer.get_instance_by_id(instance_id)]
         else:
             instances = self.load_balancer.get_all_instances()
         
-        for instance in instances:
-            try:
+        if self._fanout_semaphore is None:
+            self._fanout_semaphore = asyncio.Semaphore(16)
+        
+        # Query instances concurrently; latency is the slowest instance, not the sum
+        results = await asyncio.gather(
+            *[self._fetch_tags(instance) for instance in instances if instance is not None]
+        )
+        return [model_info for models in results for model_info in models]
+    
+    async def _fetch_tags(self, instance) -> List[Dict[str, Any]]:
+        """Get the models installed on one instance"""
+        models = []
+        try:
+            async with self._fanout_semaphore:
                 response = await self.http_client.get(f"{instance.url}/api/tags")
-                if response.status_code == 200:
-                    data = response.json()
-                    for model_info in data.get("models", []):
-                        model_info["instance_id"] = instance.id
-                        model_info["instance_url"] = instance.url
-                        models.append(model_info)
-            except Exception as e:
-                logger.warning(f"Failed to get models from {instance.id}: {e}")
+            if response.status_code == 200:
+                data = response.json()
+                for model_info in data.get("models", []):
+                    model_info["instance_id"] = instance.instance_id
+                    model_info["instance_url"] = instance.url
+                    models.append(model_info)
+        except Exception as e:
+            logger.warning(f"Failed to get models from {instance.instance_id}: {e}")
         
         return models
     
@@ -210,18 +287,13 @@ class LLMService:
             payload = {"name": model_name}
             
             async with self.http_client.stream("POST", url, json=payload) as response:
-                async for line in response.aiter_lines():
-                    if line.strip():
-                        try:
-                            data = json.loads(line)
-                            if data.get("status") == "success":
-                                logger.info(f"Model {model_name} pulled to {instance.id}")
-                                return {"instance": instance.id, "status": "success"}
-                        except json.JSONDecodeError:
-                            continue
+                async for data in iter_json_lines(response):
+                    if data.get("status") == "success":
+                        logger.info(f"Model {model_name} pulled to {instance.instance_id}")
+                        return {"instance": instance.instance_id, "status": "success"}
         except Exception as e:
-            logger.error(f"Failed to pull model to {instance.id}: {e}")
-            return {"instance": instance.id, "status": "error", "error": str(e)}
+            logger.error(f"Failed to pull model to {instance.instance_id}: {e}")
+            return {"instance": instance.instance_id, "status": "error", "error": str(e)}
     
     def get_stats(self) -> Dict[str, Any]:
         """Get service statistics"""
@@ -1,10 +1,12 @@
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, AsyncIterator
+from contextlib import asynccontextmanager
 from dataclasses import dataclass
-from datetime import datetime, timedelta
 import asyncio
+import bisect
 import random
 import statistics
 from enum import Enum
+import httpx
 from loguru import logger
 
 
@@ -26,8 +28,9 @@ class InstanceMetrics:
     total_response_time: float = 0
     average_response_time: float = 0
     total_tokens: int = 0
-    last_request_time: Optional[datetime] = None
-    last_error_time: Optional[datetime] = None
+    # Event loop (monotonic) timestamps
+    last_request_time: Optional[float] = None
+    last_error_time: Optional[float] = None
     error_count: int = 0
     is_healthy: bool = True
     health_check_failures: int = 0
@@ -37,12 +40,30 @@ class InstanceMetrics:
 class LoadBalancer:
     """Load balancer for multiple Ollama instances"""
     
-    def __init__(self, strategy: LoadBalancerStrategy = LoadBalancerStrategy.ROUND_ROBIN):
+    def __init__(
+        self,
+        strategy: LoadBalancerStrategy = LoadBalancerStrategy.ROUND_ROBIN,
+        http_client: Optional[httpx.AsyncClient] = None,
+    ):
         self.strategy = strategy
+        # Shared with LLMService so health checks reuse its connection pool
+        self.http_client = http_client
+        self._owns_http_client = http_client is None
+        self._health_check: Optional[asyncio.Task] = None
+        # update_metrics() only enqueues; a background worker applies batches.
+        # Both are created on the running loop by initialize().
+        self._metrics_queue: Optional[asyncio.Queue] = None
+        self._metrics_task: Optional[asyncio.Task] = None
         self.instances: Dict[str, InstanceMetrics] = {}
         self.instance_list: List[str] = []
         self.current_index = 0
         self.lock = asyncio.Lock()
+        # Selection state rebuilt lazily after membership, health or weight
+        # changes: the candidate list and cumulative weights for weighted mode
+        self._healthy_cache: List[InstanceMetrics] = []
+        self._cdf: List[float] = []
+        self._cdf_ids: List[str] = []
+        self._healthy_dirty = True
         self.health_check_interval = 30  # seconds
         
         # Statistics
@@ -64,8 +85,9 @@ class LoadBalancer:
             instance_id = f"ollama-{i+1}"
             await self.add_instance(instance_id, url)
         
-        # Start health checks
-        asyncio.create_task(self._health_check_task())
+        # Start health checks and metrics worker
+        self._health_check = asyncio.create_task(self._health_check_task())
+        self._start_metrics_worker()
         logger.info(f"Load balancer initialized with {len(self.instances)} instances")
     
     async def add_instance(self, instance_id: str, url: str, weight: float = 1.0):
@@ -81,6 +103,7 @@ class LoadBalancer:
             )
             self.instance_list.append(instance_id)
             self.request_distribution[instance_id] = 0
+            self._healthy_dirty = True
             logger.info(f"Added instance {instance_id} ({url}) to load balancer")
     
     async def remove_instance(self, instance_id: str):
@@ -90,57 +113,51 @@ class LoadBalancer:
                 del self.instances[instance_id]
                 self.instance_list.remove(instance_id)
                 del self.request_distribution[instance_id]
+                self._healthy_dirty = True
                 logger.info(f"Removed instance {instance_id} from load balancer")
     
     async def get_instance(self) -> InstanceMetrics:
         """Get an instance based on load balancing strategy"""
-        async with self.lock:
-            self.total_requests += 1
-            
-            if not self.instances:
-                raise RuntimeError("No instances available")
-            
-            # Filter healthy instances
-            healthy_instances = [
-                inst for inst in self.instances.values()
-                if inst.is_healthy
-            ]
-            
-            if not healthy_instances:
-                # Fallback to any instance
-                healthy_instances = list(self.instances.values())
-            
-            # Select instance based on strategy
-            if self.strategy == LoadBalancerStrategy.ROUND_ROBIN:
-                instance = await self._round_robin_select(healthy_instances)
-            elif self.strategy == LoadBalancerStrategy.LEAST_CONNECTIONS:
-                instance = await self._least_connections_select(healthy_instances)
-            elif self.strategy == LoadBalancerStrategy.RANDOM:
-                instance = await self._random_select(healthy_instances)
-            elif self.strategy == LoadBalancerStrategy.WEIGHTED:
-                instance = await self._weighted_select(healthy_instances)
-            else:
-                instance = await self._round_robin_select(healthy_instances)
-            
-            # Update metrics
-            instance.active_connections += 1
-            instance.total_requests += 1
-            instance.last_request_time = datetime.now()
-            self.request_distribution[instance.instance_id] += 1
-            
-            return instance
+        # No lock: selection never awaits, so it cannot interleave with
+        # other coroutines on the event loop
+        self.total_requests += 1
+        
+        if not self.instances:
+            raise RuntimeError("No instances available")
+        
+        if self._healthy_dirty:
+            self._rebuild_selection()
+        healthy_instances = self._healthy_cache
+        
+        # Select instance based on strategy
+        if self.strategy == LoadBalancerStrategy.ROUND_ROBIN:
+            instance = await self._round_robin_select(healthy_instances)
+        elif self.strategy == LoadBalancerStrategy.LEAST_CONNECTIONS:
+            instance = await self._least_connections_select(healthy_instances)
+        elif self.strategy == LoadBalancerStrategy.RANDOM:
+            instance = await self._random_select(healthy_instances)
+        elif self.strategy == LoadBalancerStrategy.WEIGHTED:
+            instance = await self._weighted_select(healthy_instances)
+        else:
+            instance = await self._round_robin_select(healthy_instances)
+        
+        instance.active_connections += 1
+        instance.total_requests += 1
+        instance.last_request_time = asyncio.get_running_loop().time()
+        self.request_distribution[instance.instance_id] = (
+            self.request_distribution.get(instance.instance_id, 0) + 1
+        )
+        
+        return instance
     
     async def _round_robin_select(self, instances: List[InstanceMetrics]) -> InstanceMetrics:
         """Round robin selection"""
-        if self.current_index >= len(instances):
-            self.current_index = 0
-        
-        instance = instances[self.current_index]
-        self.current_index += 1
-        return instance
+        index = self.current_index % len(instances)
+        self.current_index = index + 1
+        return instances[index]
     
     async def _least_connections_select(self, instances: List[InstanceMetrics]) -> InstanceMetrics:
-        """Select instance with least active connections"""
+        """Select instance with least active connections (snapshot may be slightly stale)"""
         return min(instances, key=lambda x: x.active_connections)
     
     async def _random_select(self, instances: List[InstanceMetrics]) -> InstanceMetrics:
@@ -149,16 +166,57 @@ class LoadBalancer:
     
     async def _weighted_select(self, instances: List[InstanceMetrics]) -> InstanceMetrics:
         """Weighted random selection"""
-        weights = [inst.weight for inst in instances]
-        return random.choices(instances, weights=weights, k=1)[0]
+        if not self._cdf or self._cdf[-1] <= 0:
+            # No healthy weighted instance; pick among the fallback set
+            weights = [inst.weight for inst in instances]
+            return random.choices(instances, weights=weights, k=1)[0]
+        
+        r = random.random() * self._cdf[-1]
+        idx = bisect.bisect_right(self._cdf, r)
+        return self.instances[self._cdf_ids[min(idx, len(self._cdf_ids) - 1)]]
+    
+    def _rebuild_selection(self):
+        """Recompute the healthy instance list and its cumulative weights"""
+        healthy = []
+        cdf = []
+        ids = []
+        total = 0.0
+        for instance_id in self.instance_list:
+            inst = self.instances[instance_id]
+            if not inst.is_healthy:
+                continue
+            healthy.append(inst)
+            if inst.weight > 0:
+                total += inst.weight
+                cdf.append(total)
+                ids.append(instance_id)
+        
+        # Fallback to any instance
+        self._healthy_cache = healthy or list(self.instances.values())
+        self._cdf = cdf
+        self._cdf_ids = ids
+        self._healthy_dirty = False
+    
+    def set_weight(self, instance_id: str, weight: float):
+        """Update an instance's weight"""
+        if instance_id in self.instances:
+            self.instances[instance_id].weight = weight
+            self._healthy_dirty = True
+    
+    @asynccontextmanager
+    async def lease_instance(self) -> AsyncIterator[InstanceMetrics]:
+        """Select an instance and release its connection slot when done"""
+        instance = await self.get_instance()
+        try:
+            yield instance
+        finally:
+            await self.release_instance(instance.instance_id)
     
     async def release_instance(self, instance_id: str):
         """Release an instance (decrement active connections)"""
-        async with self.lock:
-            if instance_id in self.instances:
-                self.instances[instance_id].active_connections = max(
-                    0, self.instances[instance_id].active_connections - 1
-                )
+        instance = self.instances.get(instance_id)
+        if instance is not None:
+            instance.active_connections = max(0, instance.active_connections - 1)
     
     async def update_metrics(
         self,
@@ -167,34 +225,76 @@ class LoadBalancer:
         response_time: float,
         tokens_used: int = 0
     ):
-        """Update instance metrics after request"""
-        async with self.lock:
-            if instance_id in self.instances:
-                instance = self.instances[instance_id]
-                instance.active_connections = max(0, instance.active_connections - 1)
-                
-                if success:
-                    instance.successful_requests += 1
-                    instance.total_response_time += response_time
-                    instance.total_tokens += tokens_used
-                    
-                    # Update average response time
-                    if instance.successful_requests > 0:
-                        instance.average_response_time = (
-                            instance.total_response_time / instance.successful_requests
-                        )
-                    
-                    # Reset error count on success
-                    instance.error_count = 0
-                else:
-                    instance.failed_requests += 1
-                    instance.error_count += 1
-                    instance.last_error_time = datetime.now()
-                    
-                    # Mark as unhealthy if too many errors
-                    if instance.error_count >= 5:
-                        instance.is_healthy = False
-                        logger.warning(f"Instance {instance_id} marked as unhealthy")
+        """Queue instance metrics after request"""
+        item = (instance_id, success, response_time, tokens_used)
+        if self._metrics_task is None or self._metrics_task.done():
+            # No worker to drain the queue; apply inline. This never awaits,
+            # so it cannot interleave with other coroutines.
+            self._apply_metrics(*item)
+            return
+        try:
+            self._metrics_queue.put_nowait(item)
+        except asyncio.QueueFull:
+            # Worker is behind; apply backpressure instead of dropping metrics
+            await self._metrics_queue.put(item)
+    
+    def _start_metrics_worker(self):
+        """Create the metrics queue and worker on the running loop"""
+        if self._metrics_task is None or self._metrics_task.done():
+            self._metrics_queue = asyncio.Queue(maxsize=4096)
+            self._metrics_task = asyncio.create_task(self._metrics_worker())
+    
+    async def _metrics_worker(self):
+        """Background task applying queued metric updates in batches"""
+        while True:
+            batch = [await self._metrics_queue.get()]
+            while not self._metrics_queue.empty():
+                batch.append(self._metrics_queue.get_nowait())
+            
+            try:
+                async with self.lock:
+                    for item in batch:
+                        self._apply_metrics(*item)
+            except Exception as e:
+                logger.error(f"Metrics update error: {e}")
+            finally:
+                for _ in batch:
+                    self._metrics_queue.task_done()
+    
+    def _apply_metrics(
+        self,
+        instance_id: str,
+        success: bool,
+        response_time: float,
+        tokens_used: int
+    ):
+        """Apply a single metric update (without awaiting, so it runs atomically)"""
+        instance = self.instances.get(instance_id)
+        if instance is None:
+            return
+        
+        if success:
+            instance.successful_requests += 1
+            instance.total_response_time += response_time
+            instance.total_tokens += tokens_used
+            
+            # Update average response time
+            instance.average_response_time = (
+                instance.total_response_time / instance.successful_requests
+            )
+            
+            # Reset error count on success
+            instance.error_count = 0
+        else:
+            instance.failed_requests += 1
+            instance.error_count += 1
+            instance.last_error_time = asyncio.get_running_loop().time()
+            
+            # Mark as unhealthy if too many errors
+            if instance.error_count >= 5 and instance.is_healthy:
+                instance.is_healthy = False
+                self._healthy_dirty = True
+                logger.warning(f"Instance {instance_id} marked as unhealthy")
     
     async def mark_unhealthy(self, instance_id: str):
         """Mark instance as unhealthy"""
@@ -202,6 +302,7 @@ class LoadBalancer:
             if instance_id in self.instances:
                 self.instances[instance_id].is_healthy = False
                 self.instances[instance_id].health_check_failures += 1
+                self._healthy_dirty = True
     
     async def mark_healthy(self, instance_id: str):
         """Mark instance as healthy"""
@@ -209,6 +310,7 @@ class LoadBalancer:
             if instance_id in self.instances:
                 self.instances[instance_id].is_healthy = True
                 self.instances[instance_id].health_check_failures = 0
+                self._healthy_dirty = True
     
     async def get_instance_by_id(self, instance_id: str) -> Optional[InstanceMetrics]:
         """Get instance by ID"""
@@ -220,16 +322,16 @@ class LoadBalancer:
     
     async def _health_check_task(self):
         """Background task for health checking"""
-        import httpx
+        if self.http_client is None:
+            self.http_client = httpx.AsyncClient(timeout=5.0)
         
-        async with httpx.AsyncClient(timeout=5.0) as client:
-            while True:
-                try:
-                    await self._perform_health_checks(client)
-                except Exception as e:
-                    logger.error(f"Health check error: {e}")
-                
-                await asyncio.sleep(self.health_check_interval)
+        while True:
+            try:
+                await self._perform_health_checks(self.http_client)
+            except Exception as e:
+                logger.error(f"Health check error: {e}")
+            
+            await asyncio.sleep(self.health_check_interval)
     
     async def _perform_health_checks(self, client: httpx.AsyncClient):
         """Perform health checks on all instances"""
@@ -301,5 +403,12 @@ class LoadBalancer:
     
     async def close(self):
         """Cleanup resources"""
-        # Nothing to cleanup for now
-        pass
+        if self._health_check is not None:
+            self._health_check.cancel()
+        if self._metrics_task is not None:
+            # Let queued updates land before stopping the worker
+            if not self._metrics_task.done():
+                await self._metrics_queue.join()
+            self._metrics_task.cancel()
+        if self._owns_http_client and self.http_client is not None:
+            await self.http_client.aclose()
@@ -1 +1,49 @@
+import re
+from typing import List, Optional
 
+from pydantic import BaseModel
+
+
+# Fenced block: opening ```lang line, body, closing ``` line
+CODE_FENCE_RE = re.compile(
+    r"^[ \t]*```[ \t]*([^\n]*?)[ \t]*\n(.*?)^[ \t]*```[^\n]*$",
+    re.MULTILINE | re.DOTALL,
+)
+
+
+class ExtractedCodeBlock(BaseModel):
+    language: Optional[str] = None
+    code: str
+    start_line: int
+    end_line: int
+
+
+class CodeExtractor:
+    """Extract fenced code blocks from LLM responses"""
+
+    def extract_blocks(self, text: str) -> List[ExtractedCodeBlock]:
+        """Extract code blocks in a single pass over the original text"""
+        blocks = []
+        line = 0
+        pos = 0
+
+        for match in CODE_FENCE_RE.finditer(text):
+            code = match.group(2)
+            if code.endswith("\n"):
+                code = code[:-1]
+
+            line += text.count("\n", pos, match.start())
+            pos = match.start()
+            if not code:
+                continue
+
+            # 1-based line of the first code line, just after the fence
+            start_line = line + 2
+            blocks.append(ExtractedCodeBlock(
+                language=match.group(1).replace("```", "").strip(),
+                code=code,
+                start_line=start_line,
+                end_line=start_line + code.count("\n"),
+            ))
+
+        return blocks
@@ -1,13 +1,45 @@
-import json
+import asyncio
+from collections import OrderedDict
 from datetime import datetime
 from typing import List, Dict, Any, Optional
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass
 from pathlib import Path
+import aiosqlite
+import orjson
 from loguru import logger
 
 from src.config.settings import settings
 
 
+SCHEMA = """
+PRAGMA journal_mode=WAL;
+PRAGMA synchronous=NORMAL;
+
+CREATE TABLE IF NOT EXISTS conversations (
+    id TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    model TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    message_count INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_conversations_updated_at
+    ON conversations (updated_at);
+
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY,
+    conversation_id TEXT NOT NULL REFERENCES conversations (id),
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    tokens INTEGER,
+    metadata BLOB
+);
+CREATE INDEX IF NOT EXISTS idx_messages_conversation_id
+    ON messages (conversation_id);
+"""
+
+
 @dataclass
 class ConversationMessage:
     role: str  # "user" or "assistant"
@@ -18,14 +50,54 @@ class ConversationMessage:
 
 
 class ConversationManager:
-    """Manage conversations with file-based persistence"""
+    """Manage conversations with SQLite persistence"""
     
     def __init__(self, storage_path: str = "./data/conversations"):
         self.storage_path = Path(storage_path)
         self.storage_path.mkdir(parents=True, exist_ok=True)
-        self.conversations: Dict[str, 'Conversation'] = {}
+        self.db_path = self.storage_path / "conversations.db"
+        # Recently used conversations; the database is the source of truth,
+        # so evicted entries need no flush
+        self.max_cached = 256
+        self.conversations: "OrderedDict[str, Conversation]" = OrderedDict()
+        self._db: Optional[aiosqlite.Connection] = None
+        self._db_lock = asyncio.Lock()
+    
+    async def _get_db(self) -> aiosqlite.Connection:
+        """Open the database on first use"""
+        if self._db is None:
+            async with self._db_lock:
+                if self._db is None:
+                    db = await aiosqlite.connect(self.db_path)
+                    await db.executescript(SCHEMA)
+                    await self._import_json_files(db)
+                    self._db = db
+        return self._db
+    
+    async def _import_json_files(self, db: aiosqlite.Connection):
+        """Import conversations saved by the previous one-file-per-conversation layout"""
+        file_paths = await asyncio.to_thread(lambda: list(self.storage_path.glob("*.json")))
+        for file_path in file_paths:
+            try:
+                data = await asyncio.to_thread(file_path.read_bytes)
+                conversation = Conversation.from_dict(orjson.loads(data))
+                # A conversation commits together with its messages, so an
+                # existing row means an earlier start imported this file but
+                # failed to rename it
+                if await self._insert_conversation(db, conversation):
+                    await db.executemany(
+                        "INSERT INTO messages "
+                        "(conversation_id, role, content, timestamp, tokens, metadata) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        [self._message_row(conversation.id, msg) for msg in conversation.messages],
+                    )
+                await db.commit()
+                await asyncio.to_thread(file_path.rename, file_path.with_suffix(".json.imported"))
+            except Exception as e:
+                await db.rollback()
+                logger.error(f"Error importing conversation file {file_path}: {e}")
     
-    def create_conversation(self, title: str, model: str) -> str:
+    async def create_conversation(self, title: str, model: str) -> str:
         """Create a new conversation"""
         from uuid import uuid4
         conv_id = str(uuid4())
@@ -39,16 +111,15 @@ class ConversationManager:
             updated_at=datetime.now().isoformat(),
         )
         
-        self.conversations[conv_id] = conversation
-        self._save_conversation(conversation)
+        db = await self._get_db()
+        await self._insert_conversation(db, conversation)
+        await db.commit()
         
+        self._cache_put(conversation)
         return conv_id
     
-    def add_message(self, conv_id: str, role: str, content: str, tokens: Optional[int] = None) -> bool:
+    async def add_message(self, conv_id: str, role: str, content: str, tokens: Optional[int] = None) -> bool:
         """Add message to conversation"""
-        if conv_id not in self.conversations:
-            return False
-        
         message = ConversationMessage(
             role=role,
             content=content,
@@ -56,72 +127,147 @@ class ConversationManager:
             tokens=tokens,
         )
         
-        self.conversations[conv_id].messages.append(message)
-        self.conversations[conv_id].updated_at = datetime.now().isoformat()
+        # Append-only: one row insert, no rewrite of earlier messages
+        db = await self._get_db()
+        cursor = await db.execute(
+            "UPDATE conversations SET updated_at = ?, message_count = message_count + 1 "
+            "WHERE id = ?",
+            (message.timestamp, conv_id),
+        )
+        if cursor.rowcount == 0:
+            await db.rollback()
+            return False
+        await db.execute(
+            "INSERT INTO messages "
+            "(conversation_id, role, content, timestamp, tokens, metadata) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            self._message_row(conv_id, message),
+        )
+        await db.commit()
         
-        self._save_conversation(self.conversations[conv_id])
+        conversation = self.conversations.get(conv_id)
+        if conversation is not None:
+            conversation.messages.append(message)
+            conversation.updated_at = message.timestamp
         return True
     
-    def get_conversation(self, conv_id: str) -> Optional['Conversation']:
+    async def get_conversation(self, conv_id: str) -> Optional['Conversation']:
         """Get conversation by ID"""
         if conv_id in self.conversations:
+            self.conversations.move_to_end(conv_id)
             return self.conversations[conv_id]
         
-        # Try to load from file
-        file_path = self.storage_path / f"{conv_id}.json"
-        if file_path.exists():
-            try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                conversation = Conversation.from_dict(data)
-                self.conversations[conv_id] = conversation
-                return conversation
-            except Exception as e:
-                logger.error(f"Error loading conversation {conv_id}: {e}")
+        # Try to load from database
+        db = await self._get_db()
+        async with db.execute(
+            "SELECT id, title, model, created_at, updated_at FROM conversations WHERE id = ?",
+            (conv_id,),
+        ) as cursor:
+            row = await cursor.fetchone()
+        if row is None:
+            return None
         
-        return None
+        async with db.execute(
+            "SELECT role, content, timestamp, tokens, metadata FROM messages "
+            "WHERE conversation_id = ? ORDER BY id",
+            (conv_id,),
+        ) as cursor:
+            messages = [
+                ConversationMessage(
+                    role=role,
+                    content=content,
+                    timestamp=timestamp,
+                    tokens=tokens,
+                    metadata=orjson.loads(metadata) if metadata is not None else None,
+                )
+                async for role, content, timestamp, tokens, metadata in cursor
+            ]
+        
+        conversation = Conversation(
+            id=row[0],
+            title=row[1],
+            model=row[2],
+            messages=messages,
+            created_at=row[3],
+            updated_at=row[4],
+        )
+        self._cache_put(conversation)
+        return conversation
     
-    def list_conversations(self, limit: int = 50) -> List[Dict[str, Any]]:
+    async def list_conversations(self, limit: int = 50) -> List[Dict[str, Any]]:
         """List all conversations"""
-        conversations = []
-        
-        for file_path in self.storage_path.glob("*.json"):
-            try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                
-                conversations.append({
-                    'id': data['id'],
-                    'title': data['title'],
-                    'model': data['model'],
-                    'created_at': data['created_at'],
-                    'updated_at': data['updated_at'],
-                    'message_count': len(data['messages']),
-                })
-            except Exception as e:
-                logger.error(f"Error reading conversation file {file_path}: {e}")
+        db = await self._get_db()
         
         # Sort by updated_at descending
-        conversations.sort(key=lambda x: x['updated_at'], reverse=True)
-        return conversations[:limit]
+        async with db.execute(
+            "SELECT id, title, model, created_at, updated_at, message_count "
+            "FROM conversations ORDER BY updated_at DESC LIMIT ?",
+            (limit,),
+        ) as cursor:
+            return [
+                {
+                    'id': row[0],
+                    'title': row[1],
+                    'model': row[2],
+                    'created_at': row[3],
+                    'updated_at': row[4],
+                    'message_count': row[5],
+                }
+                async for row in cursor
+            ]
     
-    def delete_conversation(self, conv_id: str) -> bool:
+    async def delete_conversation(self, conv_id: str) -> bool:
         """Delete conversation"""
-        if conv_id in self.conversations:
-            del self.conversations[conv_id]
+        self.conversations.pop(conv_id, None)
         
-        file_path = self.storage_path / f"{conv_id}.json"
-        if file_path.exists():
-            file_path.unlink()
-            return True
-        
-        return False
+        db = await self._get_db()
+        await db.execute("DELETE FROM messages WHERE conversation_id = ?", (conv_id,))
+        cursor = await db.execute("DELETE FROM conversations WHERE id = ?", (conv_id,))
+        await db.commit()
+        return cursor.rowcount > 0
+    
+    def _cache_put(self, conversation: 'Conversation'):
+        """Cache a conversation, evicting the least recently used"""
+        self.conversations[conversation.id] = conversation
+        self.conversations.move_to_end(conversation.id)
+        if len(self.conversations) > self.max_cached:
+            self.conversations.popitem(last=False)
     
-    def _save_conversation(self, conversation: 'Conversation'):
-        """Save conversation to file"""
-        file_path = self.storage_path / f"{conversation.id}.json"
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(asdict(conversation), f, indent=2, ensure_ascii=False)
+    async def close(self):
+        """Close the database connection"""
+        if self._db is not None:
+            await self._db.close()
+            self._db = None
+    
+    @staticmethod
+    async def _insert_conversation(db: aiosqlite.Connection, conversation: 'Conversation') -> bool:
+        """Insert a conversation row; False if it already exists"""
+        cursor = await db.execute(
+            "INSERT OR IGNORE INTO conversations "
+            "(id, title, model, created_at, updated_at, message_count) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                conversation.id,
+                conversation.title,
+                conversation.model,
+                conversation.created_at,
+                conversation.updated_at,
+                len(conversation.messages),
+            ),
+        )
+        return cursor.rowcount > 0
+    
+    @staticmethod
+    def _message_row(conv_id: str, message: ConversationMessage) -> tuple:
+        """Column values for a messages row"""
+        return (
+            conv_id,
+            message.role,
+            message.content,
+            message.timestamp,
+            message.tokens,
+            orjson.dumps(message.metadata) if message.metadata is not None else None,
+        )
 
 
 @dataclass
@@ -150,14 +296,3 @@ class Conversation:
             created_at=data['created_at'],
             updated_at=data['updated_at'],
         )
-    
-    def to_dict(self) -> dict:
-        """Convert to dict"""
-        return {
-            'id': self.id,
-            'title': self.title,
-            'model': self.model,
-            'messages': [asdict(msg) for msg in self.messages],
-            'created_at': self.created_at,
-            'updated_at': self.updated_at,
-        }
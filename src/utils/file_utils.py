@@ -1,16 +1,95 @@
+import asyncio
+import errno
+import io
 import os
+import re
+import secrets
 import shutil
-import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional, Set
-from datetime import datetime
-import aiofiles
+from typing import BinaryIO, NamedTuple, Optional, Set
 from fastapi import UploadFile
 from loguru import logger
 
 from src.config.settings import settings
 
 
+# Storage roots, parsed once; settings are fixed for the process lifetime
+_UPLOAD_ROOT = Path(settings.UPLOAD_PATH)
+_EXPORT_ROOT = Path(settings.EXPORT_PATH)
+
+# Characters replaced in export filenames, in a single translate pass
+_EXPORT_TRANS = str.maketrans({" ": "_", "/": "_", "\\": "_"})
+
+# File names that start with a _timestamp() prefix
+_TIMESTAMP_NAME_RE = re.compile(r"\d{8}_\d{6}")
+
+# Directories already created by this process; skips a failing mkdir per call
+_ensured_dirs: Set[Path] = set()
+_ensured_dirs_lock = threading.Lock()
+
+
+def _ensure_dir(directory: Path):
+    """Create directory once per process"""
+    if directory in _ensured_dirs:
+        return
+    with _ensured_dirs_lock:
+        directory.mkdir(parents=True, exist_ok=True)
+        _ensured_dirs.add(directory)
+
+
+def _timestamp(seconds: Optional[float] = None) -> str:
+    """Local time as YYYYmmdd_HHMMSS, formatted without strftime"""
+    t = time.localtime(seconds)
+    return (
+        f"{t.tm_year:04d}{t.tm_mon:02d}{t.tm_mday:02d}_"
+        f"{t.tm_hour:02d}{t.tm_min:02d}{t.tm_sec:02d}"
+    )
+
+
+def _sync_copy(source: BinaryIO, path: Path):
+    """Copy a file object to path, for use from a worker thread"""
+    with open(path, 'wb') as f:
+        src_fd = _real_fileno(source)
+        if src_fd is not None and _copy_file_range(src_fd, f.fileno(), source.tell()):
+            return
+        shutil.copyfileobj(source, f, length=1 << 20)
+
+
+def _real_fileno(source: BinaryIO) -> Optional[int]:
+    """File descriptor backing source, or None for in-memory files"""
+    if not hasattr(os, "copy_file_range"):
+        return None
+    # fileno() on an unrolled SpooledTemporaryFile would force it to disk
+    if not getattr(source, "_rolled", True):
+        return None
+    try:
+        return source.fileno()
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        return None
+
+
+def _copy_file_range(src_fd: int, dst_fd: int, offset: int) -> bool:
+    """Copy src_fd from offset to dst_fd inside the kernel; False if unsupported"""
+    size = os.fstat(src_fd).st_size
+    copied = False
+    while offset < size:
+        try:
+            count = os.copy_file_range(src_fd, dst_fd, size - offset, offset)
+        except OSError as e:
+            # Nothing written yet: let the caller fall back to a userspace copy
+            if not copied and e.errno in (errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP):
+                return False
+            raise
+        if count == 0:
+            break
+        offset += count
+        copied = True
+    return True
+
+
 async def save_upload_file(
     upload_file: UploadFile,
     prefix: str = "uploads",
@@ -19,11 +98,13 @@ async def save_upload_file(
     """Save uploaded file with safety checks"""
     
     # Create upload directory
-    upload_dir = Path(settings.UPLOAD_PATH) / prefix
-    upload_dir.mkdir(parents=True, exist_ok=True)
+    upload_dir = _UPLOAD_ROOT / prefix
+    if upload_dir not in _ensured_dirs:
+        # First use only; keep the mkdir syscalls off the event loop
+        await asyncio.to_thread(_ensure_dir, upload_dir)
     
     # Generate safe filename
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    timestamp = _timestamp()
     original_filename = upload_file.filename or "file"
     file_ext = Path(original_filename).suffix.lower()
     
@@ -32,78 +113,150 @@ async def save_upload_file(
         raise ValueError(f"File extension {file_ext} not allowed")
     
     # Create unique filename
-    file_hash = hashlib.md5(f"{timestamp}_{original_filename}".encode()).hexdigest()[:8]
+    file_hash = secrets.token_hex(4)
     safe_filename = f"{timestamp}_{file_hash}{file_ext}"
     file_path = upload_dir / safe_filename
     
     # Save file
     try:
-        async with aiofiles.open(file_path, 'wb') as f:
-            content = await upload_file.read()
-            await f.write(content)
+        # Stream the spooled upload to disk in one thread hop without
+        # buffering the whole file in memory (kernel-side when it is on disk)
+        await asyncio.to_thread(_sync_copy, upload_file.file, file_path)
         
         logger.info(f"File saved: {file_path}")
         return file_path
         
     except Exception as e:
         logger.error(f"Error saving file: {e}")
-        if file_path.exists():
-            file_path.unlink()
+        await asyncio.to_thread(file_path.unlink, missing_ok=True)
         raise
 
 
 def get_export_path(filename: str) -> Path:
     """Get export file path"""
-    export_dir = Path(settings.EXPORT_PATH)
-    export_dir.mkdir(parents=True, exist_ok=True)
+    export_dir = _EXPORT_ROOT
+    _ensure_dir(export_dir)
     
     # Add timestamp to avoid collisions
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    safe_name = filename.replace(" ", "_").replace("/", "_")
+    timestamp = _timestamp()
+    safe_name = filename.translate(_EXPORT_TRANS)
     return export_dir / f"{timestamp}_{safe_name}"
 
 
+# Stale file count above which cleanup unlinks files concurrently
+UNLINK_BATCH_THRESHOLD = 256
+
+
 def cleanup_old_files(directory: Path, max_age_days: int = 7):
     """Cleanup old files in directory"""
-    if not directory.exists():
+    cutoff_time = time.time() - (max_age_days * 24 * 60 * 60)
+    
+    # scandir reports a missing directory itself; no separate exists() stat
+    try:
+        scanner = os.scandir(directory)
+    except FileNotFoundError:
         return
     
-    cutoff_time = datetime.now().timestamp() - (max_age_days * 24 * 60 * 60)
+    # Our files are named with their creation time (see _timestamp); a name
+    # newer than the cutoff means the file cannot be stale, so skip its stat
+    cutoff_name = _timestamp(cutoff_time)
+    
+    # The file type comes from the directory entry; the one stat per file is
+    # an lstat, which DirEntry serves from its cached data on Windows
+    with scanner as entries:
+        stale = [
+            entry.path for entry in entries
+            if entry.is_file(follow_symlinks=False)
+            and not (
+                _TIMESTAMP_NAME_RE.match(entry.name)
+                and entry.name[:15] >= cutoff_name
+            )
+            and entry.stat(follow_symlinks=False).st_mtime < cutoff_time
+        ]
     
-    for file_path in directory.iterdir():
-        if file_path.is_file():
-            if file_path.stat().st_mtime < cutoff_time:
-                try:
-                    file_path.unlink()
-                    logger.info(f"Deleted old file: {file_path}")
-                except Exception as e:
-                    logger.error(f"Error deleting file {file_path}: {e}")
+    # Large batches are unlinked from a small pool to overlap syscall latency
+    if len(stale) < UNLINK_BATCH_THRESHOLD:
+        results = list(map(_unlink_file, stale))
+    else:
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(_unlink_file, stale, chunksize=64))
+    
+    # One record per run rather than one per file
+    deleted = [path for path, ok in zip(stale, results) if ok]
+    if deleted:
+        logger.info("Deleted {} old files from {}", len(deleted), directory)
+        logger.debug("Deleted paths: {}", deleted)
+
+
+def _unlink_file(path: str) -> bool:
+    """Delete one file, logging failures"""
+    try:
+        os.unlink(path)
+        return True
+    except Exception as e:
+        logger.error(f"Error deleting file {path}: {e}")
+        return False
+
+
+def _scandir_size(path: str) -> int:
+    """Sum file sizes under path without following symlinks"""
+    total_size = 0
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.is_file(follow_symlinks=False):
+                total_size += entry.stat(follow_symlinks=False).st_size
+            elif entry.is_dir(follow_symlinks=False):
+                total_size += _scandir_size(entry.path)
+    return total_size
 
 
 def get_directory_size(directory: Path) -> int:
     """Get total size of directory in bytes"""
-    if not directory.exists():
+    try:
+        scanner = os.scandir(directory)
+    except FileNotFoundError:
         return 0
     
     total_size = 0
-    for file_path in directory.rglob("*"):
-        if file_path.is_file():
-            total_size += file_path.stat().st_size
+    subdirs = []
+    with scanner as entries:
+        for entry in entries:
+            if entry.is_file(follow_symlinks=False):
+                total_size += entry.stat(follow_symlinks=False).st_size
+            elif entry.is_dir(follow_symlinks=False):
+                subdirs.append(entry.path)
     
-    return total_size
+    # Subtrees are independent; walk them concurrently when there is more than one
+    if len(subdirs) < 2:
+        return total_size + sum(_scandir_size(path) for path in subdirs)
+    
+    with ThreadPoolExecutor(max_workers=min(8, len(subdirs))) as executor:
+        return total_size + sum(executor.map(_scandir_size, subdirs))
+
 
+class FileInfo(NamedTuple):
+    """File metadata; times are epoch seconds"""
+    path: str
+    size: int
+    created: float
+    modified: float
+    extension: str
+    filename: str
 
-def get_file_info(file_path: Path) -> dict:
+
+def get_file_info(file_path: Path) -> Optional[FileInfo]:
     """Get file information"""
-    if not file_path.exists():
-        return {}
+    # A single stat doubles as the existence check
+    try:
+        stat = os.stat(file_path)
+    except FileNotFoundError:
+        return None
     
-    stat = file_path.stat()
-    return {
-        "path": str(file_path),
-        "size": stat.st_size,
-        "created": datetime.fromtimestamp(stat.st_ctime).isoformat(),
-        "modified": datetime.fromtimestamp(stat.st_mtime).isoformat(),
-        "extension": file_path.suffix.lower(),
-        "filename": file_path.name,
-    }
+    return FileInfo(
+        path=str(file_path),
+        size=stat.st_size,
+        created=stat.st_ctime,
+        modified=stat.st_mtime,
+        extension=file_path.suffix.lower(),
+        filename=file_path.name,
+    )
@@ -3,6 +3,9 @@ import requests
 import time
 import subprocess
 
+# Reuse keep-alive connections across probes
+SESSION = requests.Session()
+
 def print_color(text, color="white"):
     colors = {
         "red": "\033[91m",
@@ -21,7 +24,7 @@ def test_ollama_with_retry():
     for i in range(3):
         try:
             print_color(f"  Attempt {i+1}/3...", "yellow")
-            response = requests.get("http://localhost:11434/api/tags", timeout=10)
+            response = SESSION.get("http://localhost:11434/api/tags", timeout=10)
             if response.status_code == 200:
                 data = response.json()
                 print_color(f"  ✅ Ollama responding with {len(data.get('models', []))} models", "green")
@@ -48,7 +51,7 @@ def load_model():
             }
         }
         
-        response = requests.post(
+        response = SESSION.post(
             "http://localhost:11434/api/generate",
             json=test_prompt,
             timeout=30  # Give it 30 seconds
@@ -75,7 +78,7 @@ def test_llm_platform_simple():
     
     try:
         # Simple health check first
-        response = requests.get("http://localhost:8000/health", timeout=5)
+        response = SESSION.get("http://localhost:8000/health", timeout=5)
         print_color(f"✅ Health check: {response.json().get('status')}", "green")
         
         # Try a very short chat request
@@ -87,7 +90,7 @@ def test_llm_platform_simple():
         }
         
         print_color("  Sending simple chat request...", "yellow")
-        response = requests.post(
+        response = SESSION.post(
             "http://localhost:8000/api/chat",
             headers=headers,
             json=data,
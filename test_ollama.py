@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
-import requests
+import asyncio
+import httpx
 import json
-import time
 import subprocess
 import sys
 import os
@@ -19,11 +19,11 @@ def print_colored(text, color="white"):
     }
     print(f"{colors.get(color, colors['white'])}{text}{colors['reset']}")
 
-def test_ollama_api():
+async def probe_ollama_api(client: httpx.AsyncClient):
     """Test if Ollama API is responding"""
     print_colored("1. Testing Ollama API...", "yellow")
     try:
-        response = requests.get("http://localhost:11434/api/tags", timeout=5)
+        response = await client.get("http://localhost:11434/api/tags", timeout=5)
         if response.status_code == 200:
             data = response.json()
             models = data.get("models", [])
@@ -36,7 +36,7 @@ def test_ollama_api():
         else:
             print_colored(f"   ❌ Ollama API returned status: {response.status_code}", "red")
             return False, []
-    except requests.ConnectionError:
+    except httpx.ConnectError:
         print_colored("   ❌ Ollama API not responding - Ollama is not running", "red")
         return False, []
     except Exception as e:
@@ -93,12 +93,12 @@ def pull_deepseek_model():
         print_colored(f"   ❌ Error: {e}", "red")
         return False
 
-def start_ollama():
+async def start_ollama(client: httpx.AsyncClient):
     """Start Ollama service"""
     print_colored("4. Starting Ollama service...", "yellow")
     
     # Check if already running
-    if test_ollama_api()[0]:
+    if (await probe_ollama_api(client))[0]:
         print_colored("   ✅ Ollama is already running", "green")
         return True
     
@@ -117,8 +117,8 @@ def start_ollama():
         
         # Wait and check
         for i in range(30):  # 30 seconds max
-            time.sleep(1)
-            if test_ollama_api()[0]:
+            await asyncio.sleep(1)
+            if (await probe_ollama_api(client))[0]:
                 print_colored(f"   ✅ Ollama started successfully! (took {i+1}s)", "green")
                 return True
             if i % 5 == 0:
@@ -135,12 +135,12 @@ def start_ollama():
         print_colored(f"   ❌ Error starting Ollama: {e}", "red")
         return False
 
-def test_ollama_generate():
+async def probe_ollama_generate(client: httpx.AsyncClient):
     """Test Ollama generate endpoint"""
     print_colored("5. Testing Ollama generate endpoint...", "yellow")
     
     try:
-        response = requests.post(
+        response = await client.post(
             "http://localhost:11434/api/generate",
             json={
                 "model": "deepseek-coder:6.7b",
@@ -160,26 +160,35 @@ def test_ollama_generate():
             print_colored(f"   Error: {response.text[:200]}", "red")
             return False
             
-    except requests.ConnectionError:
+    except httpx.ConnectError:
         print_colored("   ❌ Cannot connect to Ollama", "red")
         return False
     except Exception as e:
         print_colored(f"   ❌ Error: {e}", "red")
         return False
 
-def test_llm_platform():
+async def get_platform_health(client: httpx.AsyncClient):
+    """Fetch the platform health check; errors are reported by probe_llm_platform"""
+    try:
+        return await client.get("http://localhost:8000/health", timeout=5)
+    except Exception as e:
+        return e
+
+async def probe_llm_platform(client: httpx.AsyncClient, health=None):
     """Test LLM Platform API"""
     print_colored("6. Testing LLM Platform API...", "yellow")
     
     try:
-        # Test health
-        response = requests.get("http://localhost:8000/health", timeout=5)
+        # Test health, reusing an earlier check when given one
+        response = health if health is not None else await get_platform_health(client)
+        if isinstance(response, Exception):
+            raise response
         if response.status_code == 200:
             print_colored("   ✅ LLM Platform API is running", "green")
             
             # Test models endpoint
             headers = {"Authorization": "Bearer default-api-key"}
-            response = requests.get("http://localhost:8000/api/models", headers=headers, timeout=5)
+            response = await client.get("http://localhost:8000/api/models", headers=headers, timeout=5)
             
             if response.status_code == 200:
                 models = response.json()
@@ -191,7 +200,7 @@ def test_llm_platform():
                     "model_name": "deepseek-coder:6.7b"
                 }
                 
-                response = requests.post(
+                response = await client.post(
                     "http://localhost:8000/api/chat",
                     headers=headers,
                     json=chat_data,
@@ -218,7 +227,7 @@ def test_llm_platform():
             print_colored(f"   ❌ Health check failed: {response.status_code}", "red")
             return False, "health_failed"
             
-    except requests.ConnectionError:
+    except httpx.ConnectError:
         print_colored("   ❌ LLM Platform API not running", "red")
         print_colored("   💡 Start it with: python run.py", "yellow")
         return False, "not_running"
@@ -226,21 +235,32 @@ def test_llm_platform():
         print_colored(f"   ❌ Error: {e}", "red")
         return False, "error"
 
-def main():
+async def main():
     """Main function"""
     print_colored("🔍 Testing LLM Platform Setup", "cyan")
     print_colored("=" * 60, "cyan")
     print()
     
-    # Test Ollama
-    ollama_working, models = test_ollama_api()
+    async with httpx.AsyncClient() as client:
+        await run_probes(client)
+
+
+async def run_probes(client: httpx.AsyncClient):
+    """Run the probes, overlapping the independent ones"""
+    # The Ollama tags check and the platform health check are independent;
+    # run both at once. The platform chat probe needs Ollama and the model,
+    # so it runs after the pull/generate phase.
+    (ollama_working, models), platform_health = await asyncio.gather(
+        probe_ollama_api(client),
+        get_platform_health(client),
+    )
     
     # If Ollama not working, try to start it
     if not ollama_working:
         print()
-        start_ollama()
+        await start_ollama(client)
         # Test again
-        ollama_working, models = test_ollama_api()
+        ollama_working, models = await probe_ollama_api(client)
     
     # Check for deepseek model
     deepseek_available = False
@@ -250,9 +270,9 @@ def main():
         # If not available, pull it
         if not deepseek_available:
             print()
-            pull_deepseek_model()
+            await asyncio.to_thread(pull_deepseek_model)
             # Check again
-            ollama_working, models = test_ollama_api()
+            ollama_working, models = await probe_ollama_api(client)
             if ollama_working:
                 deepseek_available = check_deepseek_model(models)
     
@@ -260,11 +280,11 @@ def main():
     generate_working = False
     if ollama_working and deepseek_available:
         print()
-        generate_working = test_ollama_generate()
+        generate_working = await probe_ollama_generate(client)
     
     # Test LLM Platform
     print()
-    platform_working, platform_status = test_llm_platform()
+    platform_working, platform_status = await probe_llm_platform(client, platform_health)
     
     # Summary
     print()
@@ -337,7 +357,7 @@ def main():
 
 if __name__ == "__main__":
     try:
-        main()
+        asyncio.run(main())
     except KeyboardInterrupt:
         print()
         print_colored("🛑 Tests interrupted by user", "yellow")
@@ -6,16 +6,19 @@ print("Testing database...")
 try:
     conn = sqlite3.connect("llm_platform.db")
     cursor = conn.cursor()
+    # Inspection only; SQLite can skip write locking
+    cursor.execute("PRAGMA query_only = 1")
     
-    # List tables
-    cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
+    # List tables with their column counts in one statement
+    cursor.execute(
+        "SELECT m.name, (SELECT COUNT(*) FROM pragma_table_info(m.name)) "
+        "FROM sqlite_master m WHERE m.type='table'"
+    )
     tables = cursor.fetchall()
     
     print(f"✅ Found {len(tables)} tables:")
-    for table in tables:
-        cursor.execute(f"PRAGMA table_info({table[0]})")
-        columns = cursor.fetchall()
-        print(f"  • {table[0]} ({len(columns)} columns)")
+    for name, column_count in tables:
+        print(f"  • {name} ({column_count} columns)")
     
     # Test user
     cursor.execute("SELECT username, email, is_admin FROM users")
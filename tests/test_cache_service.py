@@ -0,0 +1,187 @@
+import asyncio
+import json
+import time
+
+import fakeredis
+import pytest
+
+from src.services.cache_service import COMPRESS_THRESHOLD, CacheService, _decode, _encode
+
+
+@pytest.mark.parametrize("value", [
+    None,
+    0,
+    42,
+    "",
+    "def main():\n    pass",
+    [1, "two", None],
+    {"response": "Hello", "tokens": 12, "done": True},
+])
+def test_encode_decode_round_trip(value):
+    assert _decode(_encode(value)) == value
+
+
+def test_large_payloads_are_compressed():
+    value = "x" * (COMPRESS_THRESHOLD * 4)
+    encoded = _encode(value)
+    
+    assert len(encoded) < COMPRESS_THRESHOLD
+    assert _decode(encoded) == value
+
+
+@pytest.mark.parametrize("value", [
+    "cached response",
+    {"response": "Hello", "model": "deepseek-coder:6.7b"},
+    [{"role": "user"}, {"role": "assistant"}],
+])
+def test_decode_legacy_json(value):
+    # Entries written before the msgpack switch were plain JSON
+    assert _decode(json.dumps(value).encode()) == value
+
+
+@pytest.fixture
+def cache():
+    service = CacheService()
+    service.redis = fakeredis.FakeAsyncRedis(server=fakeredis.FakeServer())
+    return service
+
+
+@pytest.mark.asyncio
+async def test_get_many_keeps_key_order(cache):
+    await cache.set("a", "first")
+    await cache.set("c", {"n": 3})
+    
+    assert await cache.get_many(["c", "b", "a"]) == [{"n": 3}, None, "first"]
+
+
+@pytest.mark.asyncio
+async def test_coalesced_gets_share_one_mget(cache, monkeypatch):
+    cache.coalesce_gets = True
+    await cache.set("a", 1)
+    await cache.set("b", 2)
+    
+    batches = []
+    get_many = cache.get_many
+    
+    async def recording_get_many(keys):
+        batches.append(keys)
+        return await get_many(keys)
+    
+    monkeypatch.setattr(cache, "get_many", recording_get_many)
+    results = await asyncio.gather(cache.get("a"), cache.get("b"), cache.get("missing"))
+    
+    assert results == [1, 2, None]
+    assert batches == [["a", "b", "missing"]]
+
+
+@pytest.mark.asyncio
+async def test_coalesced_gets_fail_together(cache, monkeypatch):
+    cache.coalesce_gets = True
+    
+    async def failing_get_many(keys):
+        raise ConnectionError("redis down")
+    
+    monkeypatch.setattr(cache, "get_many", failing_get_many)
+    results = await asyncio.gather(cache.get("a"), cache.get("b"), return_exceptions=True)
+    
+    assert all(isinstance(result, ConnectionError) for result in results)
+
+
+@pytest.mark.asyncio
+async def test_l1_serves_hot_keys_without_redis(cache):
+    await cache.set("a", "value")
+    assert await cache.get("a") == "value"
+    
+    # Gone from Redis, still in L1
+    await cache.redis.delete(f"{cache.prefix}a")
+    assert await cache.get("a") == "value"
+
+
+@pytest.mark.asyncio
+async def test_l1_returns_private_copies(cache):
+    await cache.set("a", {"items": [1]})
+    first = await cache.get("a")
+    first["items"].append(2)
+    
+    assert await cache.get("a") == {"items": [1]}
+
+
+@pytest.mark.asyncio
+async def test_l1_expiry_is_capped_by_redis_ttl(cache):
+    await cache.set("a", "value", ttl=1)
+    await cache.get("a")
+    
+    expires_at, _ = cache._l1["a"]
+    assert expires_at - time.monotonic() <= 1
+
+
+@pytest.mark.asyncio
+async def test_l1_cached_none_is_a_hit(cache):
+    await cache.set("a", None)
+    assert await cache.get("a") is None
+    await cache.redis.delete(f"{cache.prefix}a")
+    
+    assert await cache.get("a") is None
+    assert cache._stat_deltas.get("misses", 0) == 0
+
+
+async def flush_stat_deltas(cache):
+    # Pending hit counts ride along with the next Redis read
+    await cache.get("flush")
+
+
+@pytest.mark.asyncio
+async def test_eviction_keeps_hot_entries(cache):
+    cache.max_entries = 10
+    for i in range(10):
+        await cache.set(f"k{i}", i)
+    for _ in range(3):
+        await cache.get("k0")
+    await flush_stat_deltas(cache)
+    
+    await cache.set("k10", 10)
+    
+    # k0 has hits; k1 is the oldest entry without any
+    assert await cache.redis.exists(f"{cache.prefix}k0")
+    assert not await cache.redis.exists(f"{cache.prefix}k1")
+    assert await cache.redis.exists(f"{cache.prefix}k10")
+    assert await cache.redis.zcard(cache.eviction_key) == 10
+
+
+@pytest.mark.asyncio
+async def test_reset_keeps_hit_score(cache):
+    cache.max_entries = 10
+    await cache.set("a", 1)
+    await cache.get("a")
+    await cache.get("a")
+    await flush_stat_deltas(cache)
+    
+    await cache.set("a", 2)
+    
+    assert await cache.redis.zscore(cache.eviction_key, "a") >= 3
+
+
+@pytest.mark.asyncio
+async def test_expired_entries_are_pruned_before_evicting(cache):
+    cache.max_entries = 3
+    for key in ("a", "b", "c"):
+        await cache.set(key, key)
+    # Simulate "a" expiring by TTL
+    await cache.redis.delete(f"{cache.prefix}a")
+    await cache.redis.zadd(cache.expiry_key, {"a": 0})
+    
+    await cache.set("d", "d")
+    
+    for key in ("b", "c", "d"):
+        assert await cache.redis.exists(f"{cache.prefix}{key}")
+    assert await cache.redis.zcard(cache.eviction_key) == 3
+
+
+@pytest.mark.asyncio
+async def test_no_index_without_budget(cache):
+    cache.max_entries = 0
+    await cache.set("a", 1)
+    await cache.get("a")
+    await flush_stat_deltas(cache)
+    
+    assert not await cache.redis.exists(cache.eviction_key, cache.expiry_key)
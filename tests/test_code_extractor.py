@@ -0,0 +1,27 @@
+from src.utils.code_extractor import CodeExtractor
+
+
+def test_extract_blocks():
+    text = (
+        "Here is the code:\n"
+        "```python\n"
+        "print('hi')\n"
+        "x = 1\n"
+        "```\n"
+        "An empty block:\n"
+        "```\n"
+        "```\n"
+        "  ```js\n"
+        "console.log(1)\n"
+        "  ```\n"
+    )
+    blocks = CodeExtractor().extract_blocks(text)
+    
+    assert [(b.language, b.code, b.start_line, b.end_line) for b in blocks] == [
+        ("python", "print('hi')\nx = 1", 3, 4),
+        ("js", "console.log(1)", 10, 10),
+    ]
+
+
+def test_extract_blocks_without_fences():
+    assert CodeExtractor().extract_blocks("No code here, just ``inline`` ticks.") == []
@@ -0,0 +1,90 @@
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from src.database import crud
+from src.database.session import Base
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def session_factory(engine):
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def make_user_id(session_factory) -> int:
+    db = session_factory()
+    user = crud.create_user(db, {"username": "test", "email": "test@example.com", "hashed_password": "x"})
+    user_id = user.id
+    db.close()
+    return user_id
+
+
+def test_insert_returning_loads_defaults_without_select(engine, session_factory):
+    user_id = make_user_id(session_factory)
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    
+    db = session_factory()
+    job = crud.create_finetune_job(db, {
+        "user_id": user_id,
+        "base_model": "deepseek-coder:6.7b",
+        "dataset_path": "data.jsonl",
+        "method": "lora",
+    })
+    db.close()
+    
+    assert [s.split()[0] for s in statements] == ["INSERT"]
+    # Readable after the session closed, with column defaults populated
+    assert job.id is not None
+    assert job.created_at is not None
+    assert (job.status, job.epochs, job.batch_size) == ("pending", 5, 4)
+    assert job.error_message is None
+
+
+def test_insert_returning_instance_stays_session_bound(session_factory):
+    user_id = make_user_id(session_factory)
+    
+    db = session_factory()
+    job = crud.create_finetune_job(db, {
+        "user_id": user_id,
+        "base_model": "deepseek-coder:6.7b",
+        "dataset_path": "data.jsonl",
+        "method": "lora",
+    })
+    job.status = "running"
+    db.commit()
+    job_id = job.id
+    db.close()
+    
+    db = session_factory()
+    assert crud.get_finetune_job(db, job_id).status == "running"
+    db.close()
+
+
+def test_save_code_block_is_readable_after_close(session_factory):
+    db = session_factory()
+    block = crud.save_code_block(db, {
+        "message_id": 1,
+        "language": "python",
+        "code": "print('hi')",
+        "start_line": 2,
+        "end_line": 2,
+    })
+    db.close()
+    
+    assert block.id is not None
+    assert block.code == "print('hi')"
+    assert block.metadata_ is None
@@ -0,0 +1,126 @@
+import errno
+import io
+import os
+import time
+
+import pytest
+
+from src.utils import file_utils
+from src.utils.file_utils import cleanup_old_files, get_directory_size
+
+
+def write_file(path, size, age_days=0):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"x" * size)
+    if age_days:
+        mtime = time.time() - age_days * 24 * 60 * 60
+        os.utime(path, (mtime, mtime))
+    return path
+
+
+def test_cleanup_old_files_removes_only_stale_files(tmp_path):
+    stale = write_file(tmp_path / "old.txt", 1, age_days=10)
+    fresh = write_file(tmp_path / "new.txt", 1)
+    nested = write_file(tmp_path / "sub" / "old.txt", 1, age_days=10)
+    
+    cleanup_old_files(tmp_path, max_age_days=7)
+    
+    assert not stale.exists()
+    assert fresh.exists()
+    assert nested.exists()
+
+
+def test_get_directory_size(tmp_path):
+    write_file(tmp_path / "a.bin", 10)
+    write_file(tmp_path / "sub" / "b.bin", 20)
+    
+    assert get_directory_size(tmp_path) == 30
+
+
+def test_get_directory_size_sums_concurrent_subtrees(tmp_path):
+    write_file(tmp_path / "top.bin", 1)
+    for i in range(4):
+        write_file(tmp_path / f"dir{i}" / "a.bin", 10)
+        write_file(tmp_path / f"dir{i}" / "deep" / "b.bin", 100)
+    # Symlinks are not followed, so the linked file is not counted twice
+    (tmp_path / "link").symlink_to(tmp_path / "dir0")
+    
+    assert get_directory_size(tmp_path) == 1 + 4 * 110
+
+
+def test_cleanup_old_files_unlinks_large_batches(tmp_path, monkeypatch):
+    monkeypatch.setattr(file_utils, "UNLINK_BATCH_THRESHOLD", 2)
+    stale = [write_file(tmp_path / f"old{i}.txt", 1, age_days=10) for i in range(5)]
+    fresh = write_file(tmp_path / "new.txt", 1)
+    
+    cleanup_old_files(tmp_path, max_age_days=7)
+    
+    assert not any(path.exists() for path in stale)
+    assert fresh.exists()
+
+
+def test_missing_directory_is_empty(tmp_path):
+    missing = tmp_path / "missing"
+    
+    cleanup_old_files(missing)
+    
+    assert get_directory_size(missing) == 0
+    assert not missing.exists()
+
+
+def test_sync_copy_from_disk_starts_at_current_offset(tmp_path):
+    source = tmp_path / "source.bin"
+    source.write_bytes(b"header" + b"payload" * 1000)
+    target = tmp_path / "target.bin"
+    
+    with open(source, "rb") as f:
+        f.seek(len(b"header"))
+        file_utils._sync_copy(f, target)
+    
+    assert target.read_bytes() == b"payload" * 1000
+
+
+def test_sync_copy_from_memory(tmp_path):
+    target = tmp_path / "target.bin"
+    
+    file_utils._sync_copy(io.BytesIO(b"in memory"), target)
+    
+    assert target.read_bytes() == b"in memory"
+
+
+@pytest.mark.skipif(not hasattr(os, "copy_file_range"), reason="copy_file_range unavailable")
+def test_sync_copy_falls_back_when_copy_file_range_unsupported(tmp_path, monkeypatch):
+    def unsupported(*args):
+        raise OSError(errno.EXDEV, "cross-device")
+    
+    monkeypatch.setattr(file_utils.os, "copy_file_range", unsupported)
+    source = write_file(tmp_path / "source.bin", 4096)
+    target = tmp_path / "target.bin"
+    
+    with open(source, "rb") as f:
+        file_utils._sync_copy(f, target)
+    
+    assert target.read_bytes() == source.read_bytes()
+
+
+def test_get_file_info(tmp_path):
+    path = write_file(tmp_path / "Report.JSON", 12)
+    
+    info = file_utils.get_file_info(path)
+    
+    assert isinstance(info, file_utils.FileInfo)
+    assert (info.path, info.size, info.extension, info.filename) == (
+        str(path), 12, ".json", "Report.JSON"
+    )
+    assert info.modified == os.stat(path).st_mtime
+    assert file_utils.get_file_info(tmp_path / "missing.txt") is None
+
+
+def test_cleanup_old_files_trusts_fresh_timestamp_names(tmp_path):
+    # A name newer than the cutoff is skipped without looking at its mtime
+    name = f"{file_utils._timestamp()}_abcd.txt"
+    path = write_file(tmp_path / name, 1, age_days=10)
+    
+    cleanup_old_files(tmp_path, max_age_days=7)
+    
+    assert path.exists()
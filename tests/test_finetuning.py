@@ -1 +1,64 @@
+import json
 
+import pytest
+
+from src.config.settings import settings
+from src.services.finetune_service import FinetuneService, iter_jsonl_conversations
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "FINETUNE_STORAGE_PATH", str(tmp_path / "finetune"))
+    return FinetuneService(None)
+
+
+def write_jsonl(path, items):
+    path.write_text("".join(json.dumps(item) + "\n\n" for item in items))
+    return path
+
+
+def test_iter_jsonl_conversations(tmp_path):
+    path = write_jsonl(tmp_path / "data.jsonl", [
+        {"conversations": [{"role": "user", "content": "Hi"}]},
+        {"messages": [{"role": "user", "content": "Sort"}, {"role": "assistant", "content": "sorted()"}]},
+        [{"role": "assistant", "content": "Bare"}],
+    ])
+    
+    assert list(iter_jsonl_conversations(str(path))) == [
+        {"text": "user: Hi\n"},
+        {"text": "user: Sort\nassistant: sorted()\n"},
+        {"text": "assistant: Bare\n"},
+    ]
+
+
+def test_load_jsonl_dataset_streams_from_path(service, tmp_path):
+    path = write_jsonl(tmp_path / "data.jsonl", [
+        {"messages": [{"role": "user", "content": "Hi"}]},
+        {"messages": [{"role": "user", "content": "Bye"}]},
+    ])
+    
+    # Only the location and row count; records are read at training time
+    assert service._load_dataset(str(path)) == {
+        "format": "text",
+        "path": str(path),
+        "size": 2,
+    }
+
+
+def test_load_missing_dataset(service, tmp_path):
+    with pytest.raises(FileNotFoundError):
+        service._load_dataset(str(tmp_path / "missing.jsonl"))
+
+
+def test_load_csv_dataset(service, tmp_path):
+    path = tmp_path / "data.csv"
+    path.write_text("prompt,completion,notes\nHi,Hello,x\n\"Sort, please\",sorted(),y\n")
+    
+    assert service._load_dataset(str(path)) == {
+        "format": "text",
+        "data": [
+            "user: Hi\nassistant: Hello\n",
+            "user: Sort, please\nassistant: sorted()\n",
+        ],
+        "size": 2,
+    }
@@ -0,0 +1,37 @@
+import pytest
+
+from src.services.llm_service import iter_json_lines
+
+
+class ChunkedResponse:
+    """Stands in for a streamed httpx response"""
+    
+    def __init__(self, chunks):
+        self.chunks = chunks
+    
+    async def aiter_bytes(self):
+        for chunk in self.chunks:
+            yield chunk
+
+
+BODY = (
+    b'{"response": "def", "done": false}\n'
+    b'\n'
+    b'not json\n'
+    b'{"response": "' + b"x" * 300 + b'", "done": false}\n'
+    b'{"done": true, "total_tokens": 7}'
+)
+
+EXPECTED = [
+    {"response": "def", "done": False},
+    {"response": "x" * 300, "done": False},
+    {"done": True, "total_tokens": 7},
+]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("chunk_size", [1, 7, 64, len(BODY)])
+async def test_iter_json_lines_across_chunk_boundaries(chunk_size):
+    chunks = [BODY[i:i + chunk_size] for i in range(0, len(BODY), chunk_size)]
+    
+    assert [data async for data in iter_json_lines(ChunkedResponse(chunks))] == EXPECTED
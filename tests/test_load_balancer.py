@@ -0,0 +1,68 @@
+import pytest
+
+from src.services import load_balancer
+from src.services.load_balancer import LoadBalancer, LoadBalancerStrategy
+
+
+async def make_balancer(*weights, strategy=LoadBalancerStrategy.WEIGHTED):
+    balancer = LoadBalancer(strategy=strategy)
+    for i, weight in enumerate(weights):
+        await balancer.add_instance(f"ollama-{i+1}", f"http://ollama-{i+1}:11434", weight=weight)
+    return balancer
+
+
+@pytest.mark.asyncio
+async def test_weighted_select_follows_cumulative_weights(monkeypatch):
+    balancer = await make_balancer(1.0, 3.0)
+    
+    # Cumulative weights are [1, 4]: draws below 1/4 land on the first instance
+    monkeypatch.setattr(load_balancer.random, "random", lambda: 0.2)
+    assert (await balancer.get_instance()).instance_id == "ollama-1"
+    monkeypatch.setattr(load_balancer.random, "random", lambda: 0.3)
+    assert (await balancer.get_instance()).instance_id == "ollama-2"
+    monkeypatch.setattr(load_balancer.random, "random", lambda: 0.999)
+    assert (await balancer.get_instance()).instance_id == "ollama-2"
+
+
+@pytest.mark.asyncio
+async def test_weighted_select_skips_zero_weight_and_unhealthy(monkeypatch):
+    balancer = await make_balancer(1.0, 0.0, 1.0)
+    await balancer.mark_unhealthy("ollama-1")
+    
+    for draw in (0.0, 0.5, 0.999):
+        monkeypatch.setattr(load_balancer.random, "random", lambda: draw)
+        assert (await balancer.get_instance()).instance_id == "ollama-3"
+
+
+@pytest.mark.asyncio
+async def test_weighted_select_rebuilds_after_weight_change(monkeypatch):
+    balancer = await make_balancer(1.0, 1.0)
+    monkeypatch.setattr(load_balancer.random, "random", lambda: 0.2)
+    assert (await balancer.get_instance()).instance_id == "ollama-1"
+    
+    balancer.set_weight("ollama-1", 0.0)
+    assert (await balancer.get_instance()).instance_id == "ollama-2"
+
+
+@pytest.mark.asyncio
+async def test_lease_instance_releases_slot():
+    balancer = await make_balancer(1.0)
+    
+    async with balancer.lease_instance() as instance:
+        assert instance.active_connections == 1
+    assert instance.active_connections == 0
+    
+    with pytest.raises(RuntimeError):
+        async with balancer.lease_instance() as instance:
+            raise RuntimeError("generation failed")
+    assert instance.active_connections == 0
+
+
+@pytest.mark.asyncio
+async def test_round_robin_cycles_healthy_instances():
+    balancer = await make_balancer(1.0, 1.0, 1.0, strategy=LoadBalancerStrategy.ROUND_ROBIN)
+    await balancer.mark_unhealthy("ollama-2")
+    
+    picked = [(await balancer.get_instance()).instance_id for _ in range(4)]
+    
+    assert picked == ["ollama-1", "ollama-3", "ollama-1", "ollama-3"]